@@ -292,6 +292,9 @@ PASSWORD_EXPIRY_DAYS = int(os.getenv("PASSWORD_EXPIRY_DAYS", "90"))
 BACKUP_ROOT = BASE_DIR / 'backups'
 BACKUP_STORAGE_PATH = BACKUP_ROOT / 'storage'
 
+# Taille maximale d'un upload de sauvegarde externe (refus avant toute écriture ou hachage)
+EXTERNAL_UPLOAD_MAX_BYTES = int(os.getenv('EXTERNAL_UPLOAD_MAX_BYTES', str(500 * 1024 * 1024)))
+
 # Discord webhook URL pour les notifications
 DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL', '')
 
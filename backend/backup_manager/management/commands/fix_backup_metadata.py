@@ -171,8 +171,8 @@ class Command(BaseCommand):
     def _calculate_checksum(self, file_path):
         """Calcule le checksum SHA-256 d'un fichier"""
         hash_sha256 = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+        with open(file_path, "rb", buffering=0) as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 hash_sha256.update(chunk)
         return hash_sha256.hexdigest()
     
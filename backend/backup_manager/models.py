@@ -223,11 +223,8 @@ class BackupHistory(models.Model):
             return None
         
         try:
-            hash_sha256 = hashlib.sha256()
-            with open(self.file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_sha256.update(chunk)
-            self.checksum = hash_sha256.hexdigest()
+            with open(self.file_path, "rb", buffering=0) as f:
+                self.checksum = hashlib.file_digest(f, "sha256").hexdigest()
             self.save(update_fields=['checksum'])
             return self.checksum
         except (FileNotFoundError, PermissionError):
@@ -494,16 +491,16 @@ class UploadedBackup(models.Model):
             size /= 1024.0
         return f"{size:.1f} PB"
     
-    def mark_as_ready(self):
-        """Marque l'upload comme prêt pour restauration"""
+    def mark_as_ready(self, extra_fields=()):
+        """Marque l'upload comme prêt pour restauration (extra_fields: champs modifiés à enregistrer dans le même UPDATE)"""
         self.status = 'ready'
-        self.save(update_fields=['status'])
+        self.save(update_fields=['status', *extra_fields])
     
-    def mark_as_failed(self, error_message: str):
-        """Marque l'upload comme échoué"""
+    def mark_as_failed(self, error_message: str, extra_fields=()):
+        """Marque l'upload comme échoué (extra_fields: champs modifiés à enregistrer dans le même UPDATE)"""
         self.status = 'failed_validation'
         self.error_message = error_message
-        self.save(update_fields=['status', 'error_message'])
+        self.save(update_fields=['status', 'error_message', *extra_fields])
 
 
 class ExternalRestoration(models.Model):
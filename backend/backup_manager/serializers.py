@@ -3,10 +3,17 @@ Serializers pour le système de sauvegarde/restauration
 Séparation de la logique de sérialisation des vues pour une meilleure organisation
 """
 
+import re
+
+from django.conf import settings
 from rest_framework import serializers
 from .models import BackupConfiguration, BackupHistory, RestoreHistory, UploadedBackup, ExternalRestoration
 
 
+# Noms d'upload autorisés: lettres, chiffres, tirets, underscores et espaces
+UPLOAD_NAME_RE = re.compile(r'^[a-zA-Z0-9_\-\s]+$')
+
+
 class BackupConfigurationSerializer(serializers.ModelSerializer):
     """Serializer pour les configurations de sauvegarde"""
     
@@ -71,8 +78,7 @@ class UploadedBackupSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Le nom doit contenir au moins 3 caractères.")
         
         # Éviter les caractères dangereux
-        import re
-        if not re.match(r'^[a-zA-Z0-9_\-\s]+$', value):
+        if not UPLOAD_NAME_RE.match(value):
             raise serializers.ValidationError("Le nom ne peut contenir que des lettres, chiffres, tirets et espaces.")
         
         return value.strip()
@@ -147,8 +153,7 @@ class ExternalUploadRequestSerializer(serializers.Serializer):
         if len(value.strip()) < 3:
             raise serializers.ValidationError("Le nom doit contenir au moins 3 caractères.")
         
-        import re
-        if not re.match(r'^[a-zA-Z0-9_\-\s]+$', value):
+        if not UPLOAD_NAME_RE.match(value):
             raise serializers.ValidationError(
                 "Le nom ne peut contenir que des lettres, chiffres, tirets et espaces."
             )
@@ -166,8 +171,8 @@ class ExternalUploadRequestSerializer(serializers.Serializer):
                 f"Type de fichier non supporté. Formats acceptés: {', '.join(allowed_extensions)}"
             )
         
-        # Vérifier la taille (limite: 500 MB)
-        max_size = 500 * 1024 * 1024  # 500 MB
+        # Vérifier la taille (limite configurable, 500 MB par défaut)
+        max_size = getattr(settings, 'EXTERNAL_UPLOAD_MAX_BYTES', 500 * 1024 * 1024)
         if value.size > max_size:
             raise serializers.ValidationError(
                 f"Fichier trop volumineux. Taille maximale: {max_size // (1024*1024)} MB"
@@ -3,13 +3,19 @@ Service principal de sauvegarde avec architecture hybride
 """
 
 import os
+import re
+import mmap
 import subprocess
 import zipfile
 import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator, TextIO, Tuple, BinaryIO
 from django.conf import settings
+from django.db import connections
 from django.utils import timezone
 from ..models import BackupConfiguration, BackupHistory
 from .base_service import BaseService
@@ -18,11 +24,58 @@ from .storage_service import StorageService
 from .encryption_service import EncryptionService
 
 
+# Zstandard dans le conteneur ZIP quand zipfile le supporte (Python 3.14+),
+# sinon DEFLATE. Les archives restent lisibles par zipfile côté restauration.
+ARCHIVE_COMPRESSION = getattr(zipfile, 'ZIP_ZSTANDARD', zipfile.ZIP_DEFLATED)
+ARCHIVE_COMPRESSLEVEL = 3 if ARCHIVE_COMPRESSION != zipfile.ZIP_DEFLATED else None
+
+# Tokens suspects filtrés des dumps SQL, combinés en une seule expression:
+# - tokens de session (ligne de 32+ caractères alphanumériques)
+# - chaînes contenant des tokens longs
+# - sessions explicites et tokens CSRF
+SUSPICIOUS_TOKEN_RE = re.compile(
+    r'''(?i)^[a-z0-9]{32,}$|["'][a-z0-9]{25,}["']|sessionid|csrftoken'''
+)
+
+# INSERT de l'historique des sauvegardes dans un dump, quel que soit le moteur:
+# - SQLite: INSERT INTO "backup_manager_backuphistory" VALUES(...);
+# - PostgreSQL: INSERT INTO "backup_manager_backuphistory" (...) VALUES (...);
+# - MySQL: INSERT INTO `backup_manager_backuphistory` VALUES (...);
+BACKUP_HISTORY_INSERT_RE = re.compile(
+    r'''INSERT INTO [`'"]?backup_manager_backuphistory[`'"]?(?:\s*\([^)]+\))?\s*VALUES\s*\(([^)]+)\);''',
+    re.IGNORECASE
+)
+
+
 class BackupService(BaseService):
     """Service principal pour créer les sauvegardes"""
     
     # Constantes
     DATABASE_DUMP_FILENAME = "database.sql"
+    FILES_DIRNAME = "files"
+    DUMP_BUFFER_SIZE = 1024 * 1024  # 1MB pour le flux du dump SQL
+    ARCHIVE_BUFFER_SIZE = 1024 * 1024  # 1MB par bloc écrit dans l'archive
+    SQLITE_BACKUP_PAGES = 1024  # Pages copiées par étape (les écrivains ne sont pas bloqués)
+    PG_DUMP_DIRNAME = "pgdump"
+    PG_DUMP_JOBS = min(4, os.cpu_count() or 1)  # Une connexion PostgreSQL par job
+    
+    PHASE_WORKERS = 3  # Métadonnées, données SQL et fichiers en parallèle
+    
+    # Colonnes de l'historique réellement modifiées en fin de sauvegarde
+    COMPLETED_HISTORY_FIELDS = [
+        'status', 'completed_at', 'duration_seconds', 'file_path', 'file_size', 'checksum',
+        'tables_count', 'records_count', 'files_count', 'log_data',
+    ]
+    FAILED_HISTORY_FIELDS = ['status', 'completed_at', 'duration_seconds', 'error_message', 'log_data']
+    
+    # Commandes transactionnelles retirées du dump (le RestoreService gère la transaction)
+    DUMP_SKIPPED_PREFIXES = ('BEGIN TRANSACTION', 'COMMIT', 'PRAGMA foreign_keys=OFF')
+    
+    # Extensions déjà compressées/chiffrées: stockées telles quelles dans l'archive
+    NO_COMPRESS_EXTENSIONS = frozenset({
+        '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.mkv', '.mov',
+        '.zip', '.gz', '.bz2', '.xz', '.zst', '.7z', '.encrypted'
+    })
     
     def __init__(self):
         super().__init__('BackupService')
@@ -87,40 +140,56 @@ class BackupService(BaseService):
                 'total_size': 0
             }
             
-            # Phase 1: Export des métadonnées (Django JSON)
-            if config.backup_type in ['full', 'metadata']:
-                self.log_info(f"[BACKUP] Démarrage export métadonnées")
-                metadata_stats = self._backup_metadata(backup_dir)
-                stats.update(metadata_stats)
+            # Phases 1 à 3 en parallèle: elles écrivent des fichiers distincts et
+            # passent l'essentiel de leur temps en I/O ou dans des sous-processus
+            phases = {}
+            with ThreadPoolExecutor(max_workers=self.PHASE_WORKERS) as executor:
+                # Phase 1: Export des métadonnées (Django JSON)
+                if config.backup_type in ['full', 'metadata']:
+                    self.log_info(f"[BACKUP] Démarrage export métadonnées")
+                    phases['metadata'] = executor.submit(self._run_phase, self._backup_metadata, backup_dir)
+                
+                # Phase 2: Export des données (SQL natif)
+                if config.backup_type in ['full', 'data']:
+                    self.log_info(f"[BACKUP] Démarrage export données")
+                    phases['data'] = executor.submit(self._run_phase, self._backup_database_data, backup_dir)
+                
+                # Phase 3: Sauvegarde des fichiers système (écrits en flux dans l'archive)
+                if config.include_files and config.backup_type in ['full']:
+                    self.log_info(f"[BACKUP] Démarrage backup fichiers")
+                    phases['files'] = executor.submit(self._run_phase, self._backup_files, backup_dir)
             
-            # Phase 2: Export des données (SQL natif)
-            if config.backup_type in ['full', 'data']:
-                self.log_info(f"[BACKUP] Démarrage export données")
-                data_stats = self._backup_database_data(backup_dir)
+            # Fusion des statistiques (result() relance l'exception éventuelle de la phase)
+            if 'metadata' in phases:
+                stats.update(phases['metadata'].result())
+            
+            if 'data' in phases:
+                data_stats = phases['data'].result()
                 stats['tables_count'] += data_stats.get('tables_count', 0)
                 stats['records_count'] += data_stats.get('records_count', 0)
             
-            # Phase 3: Sauvegarde des fichiers système
-            if config.include_files and config.backup_type in ['full']:
-                self.log_info(f"[BACKUP] Démarrage backup fichiers")
-                files_stats = self._backup_files(backup_dir)
+            file_entries = []
+            if 'files' in phases:
+                files_stats = phases['files'].result()
                 stats['files_count'] = files_stats.get('files_count', 0)
+                file_entries = files_stats.get('file_entries', [])
             
             # Phase 4: Création de l'archive finale
             self.log_info(f"[BACKUP] Création de l'archive finale")
-            archive_path = self._create_final_archive(backup_dir, backup_name, config.compression_enabled)
-            self.log_info(f"[BACKUP] Archive créée: {archive_path}")
-            
-            # Phase 5: Chiffrement (maintenant OBLIGATOIRE pour toutes les sauvegardes)
-            self.log_info(f"[BACKUP] Démarrage chiffrement")
-            final_path = self._encrypt_backup(archive_path, user)
-            self.log_info(f"[BACKUP] Chiffrement terminé: {final_path}")
-            archive_path.unlink()  # Suppression de l'archive non chiffrée
-            
-            # Calcul des métadonnées finales
-            final_size = final_path.stat().st_size
-            self.log_info(f"[BACKUP] Calcul checksum")
-            checksum = self.calculate_checksum(final_path)
+            # L'archive non chiffrée est un fichier temporaire anonyme, lu par le
+            # chiffrement via le même descripteur et supprimé à sa fermeture
+            with self._create_final_archive(
+                backup_dir, backup_name, config.compression_enabled, file_entries
+            ) as archive_file:
+                self.log_info(f"[BACKUP] Archive créée")
+                
+                # Phase 5: Chiffrement (maintenant OBLIGATOIRE pour toutes les sauvegardes)
+                self.log_info(f"[BACKUP] Démarrage chiffrement")
+                # Taille et checksum sont calculés pendant le chiffrement (pas de relecture)
+                final_path, final_size, checksum = self._encrypt_backup(
+                    archive_file, backup_dir.parent / f"{backup_name}.encrypted", user
+                )
+                self.log_info(f"[BACKUP] Chiffrement terminé: {final_path}")
             
             # Stockage selon la stratégie configurée
             self.log_info(f"[BACKUP] Stockage du fichier")
@@ -145,10 +214,6 @@ class BackupService(BaseService):
             self.log_info(f"[BACKUP] Nettoyage du répertoire temporaire")
             self._cleanup_temp_directory(backup_dir)
             
-            # Nettoyage automatique des fichiers temporaires anciens
-            self.log_info(f"[BACKUP] Nettoyage auto des fichiers temporaires")
-            self._auto_cleanup_temp_files()
-            
             duration = self.end_operation(f"Sauvegarde {backup_name}")
             
             # Mise à jour finale du statut
@@ -163,7 +228,8 @@ class BackupService(BaseService):
             backup_history.records_count = stats['records_count']
             backup_history.files_count = stats['files_count']
             backup_history.log_data = self.get_logs_summary()
-            backup_history.save()
+            # UPDATE limité aux colonnes modifiées
+            backup_history.save(update_fields=self.COMPLETED_HISTORY_FIELDS)
             
             # Nettoyage
             self.log_info(f"[BACKUP] Nettoyage final")
@@ -171,6 +237,14 @@ class BackupService(BaseService):
             if final_path != stored_path and final_path.exists():
                 final_path.unlink()  # Suppression du fichier local si stocké ailleurs
             
+            # Nettoyage automatique des fichiers temporaires anciens, en arrière-plan
+            # pour ne pas retarder la fin de la sauvegarde
+            from .cleanup_service import CleanupService
+            if CleanupService.schedule_auto_cleanup(self._auto_cleanup_temp_files):
+                self.log_info(f"[BACKUP] Nettoyage auto des fichiers temporaires (arrière-plan)")
+            else:
+                self.log_info(f"[BACKUP] Nettoyage auto ignoré (exécuté récemment)")
+            
             self.log_info(f"✅ Sauvegarde terminée avec chiffrement: {final_path}")
             
             return backup_history
@@ -184,7 +258,7 @@ class BackupService(BaseService):
                 backup_history.completed_at = timezone.now()
                 backup_history.error_message = str(e)
                 backup_history.log_data = self.get_logs_summary()
-                backup_history.save()
+                backup_history.save(update_fields=self.FAILED_HISTORY_FIELDS)
                 self.log_info(f"[BACKUP] Historique mis à jour avec le statut d'échec")
             except Exception as save_error:
                 self.log_error(f"[BACKUP] Erreur lors de la mise à jour de l'historique après échec: {str(save_error)}")
@@ -192,6 +266,15 @@ class BackupService(BaseService):
             self.log_error("❌ Échec de la sauvegarde", e)
             raise
     
+    @staticmethod
+    def _run_phase(phase, *args):
+        """Exécute une phase de sauvegarde dans un thread et ferme ses connexions DB"""
+        try:
+            return phase(*args)
+        finally:
+            # Les connexions Django sont propres à chaque thread
+            connections.close_all()
+    
     def _create_backup_directory(self, backup_name: str) -> Path:
         """Crée le répertoire de travail pour la sauvegarde"""
         backup_dir = self.ensure_backup_directory() / "temp" / backup_name
@@ -245,42 +328,37 @@ class BackupService(BaseService):
         sql_dump_file = backup_dir / self.DATABASE_DUMP_FILENAME
         
         try:
-            # Étape 1: Générer le dump brut
-            temp_dump_file = backup_dir / "database_raw.sql"
+            # Générer le dump, le nettoyer et corriger le statut de la sauvegarde en cours
+            # en une seule passe (pas de fichier brut intermédiaire ni de réécriture)
             cmd = ['sqlite3', str(db_path), '.dump']
             
-            with open(temp_dump_file, 'w', encoding='utf-8') as f:
-                result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True)
-            
-            if result.returncode != 0:
-                self.log_error(f"❌ Erreur sqlite3 dump: {result.stderr}")
-                # Fallback vers la copie directe en cas d'erreur
-                return self._backup_sqlite_fallback(backup_dir, db_settings)
-            
-            # Étape 2: Nettoyer le dump pour la restauration
-            self._clean_sqlite_dump(temp_dump_file, sql_dump_file)
-            
-            # Étape 3: Corriger le statut de la sauvegarde en cours dans le dump
-            # CRITIQUE: Le dump SQL contient la sauvegarde actuelle avec statut 'running'
-            # mais le fichier final doit refléter l'état 'completed' pour éviter les problèmes
-            # lors des restaurations futures
-            self._fix_current_backup_status_in_dump(sql_dump_file)
-            
-            # Supprimer le fichier temporaire
-            temp_dump_file.unlink()
+            with tempfile.TemporaryFile() as stderr_file:
+                with subprocess.Popen(
+                    cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                    bufsize=self.DUMP_BUFFER_SIZE, text=True, encoding='utf-8'
+                ) as proc:
+                    with open(sql_dump_file, 'w', encoding='utf-8', buffering=self.DUMP_BUFFER_SIZE) as out:
+                        self._clean_sqlite_dump(proc.stdout, out)
+                
+                if proc.returncode != 0:
+                    stderr_file.seek(0)
+                    stderr = stderr_file.read().decode('utf-8', errors='replace')
+                    self.log_error(f"❌ Erreur sqlite3 dump: {stderr}")
+                    # Fallback vers la copie directe en cas d'erreur
+                    return self._backup_sqlite_fallback(backup_dir, db_settings)
             
             # Statistiques du dump SQL nettoyé
             sql_file_size = sql_dump_file.stat().st_size
             
-            # Analyser le dump pour obtenir des statistiques basiques
-            stats = self._analyze_sqlite_dump(sql_dump_file)
+            # Statistiques lues directement depuis la base (pas de re-lecture du dump)
+            stats = self._get_sqlite_stats(db_path)
             
             self.log_info(f"✅ Base SQLite exportée en SQL propre: {self.format_size(sql_file_size)}")
-            self.log_info(f"📊 Tables détectées: {stats['tables_count']}, Statements: {stats['statements_count']}")
+            self.log_info(f"📊 Tables détectées: {stats['tables_count']}, Enregistrements: {stats['records_count']}")
             
             return {
                 'tables_count': stats['tables_count'],
-                'records_count': stats['statements_count'],  # Approximation
+                'records_count': stats['records_count'],
                 'data_size': sql_file_size
             }
             
@@ -289,25 +367,46 @@ class BackupService(BaseService):
             # Fallback vers la copie directe
             return self._backup_sqlite_fallback(backup_dir, db_settings)
     
-    def _clean_sqlite_dump(self, input_file: Path, output_file: Path) -> None:
-        """Nettoie un dump SQLite pour le rendre compatible avec la restauration"""
+    def _clean_sqlite_dump(self, in_stream: TextIO, out_stream: TextIO) -> Dict[str, int]:
+        """
+        Nettoie un dump SQLite pour le rendre compatible avec la restauration
+        
+        Le dump est traité ligne par ligne entre deux flux texte, sans jamais
+        être chargé entièrement en mémoire.
+        """
         self.log_info("🧹 Nettoyage du dump SQLite...")
         
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        counters = {'total_lines': 0, 'kept_lines': 0, 'suspicious_lines': 0, 'status_corrections': 0}
+        out_stream.writelines(self._iter_clean_dump_lines(in_stream, counters))
+        
+        removed_lines = counters['total_lines'] - counters['kept_lines']
+        if counters['suspicious_lines']:
+            self.log_warning(f"⚠️ {counters['suspicious_lines']} lignes avec tokens suspects filtrées")
+        self.log_info(f"✅ Dump nettoyé: {removed_lines} lignes problématiques supprimées")
+        if counters['status_corrections']:
+            self.log_info(f"✅ {counters['status_corrections']} correction(s) de statut appliquée(s) au dump SQL")
         
-        lines = content.split('\n')
-        cleaned_lines = []
+        return {
+            'total_lines': counters['total_lines'],
+            'kept_lines': counters['kept_lines'],
+            'removed_lines': removed_lines,
+            'status_corrections': counters['status_corrections']
+        }
+    
+    def _iter_clean_dump_lines(self, lines: Iterator[str], counters: Dict[str, int]) -> Iterator[str]:
+        """Générateur des lignes du dump à conserver, met à jour les compteurs au passage"""
+        debug_enabled = self._debug_enabled
+        current_time = timezone.now().strftime('%Y-%m-%d %H:%M:%S.%f')
         
         # Filtrer les lignes problématiques
         for line in lines:
+            counters['total_lines'] += 1
             line_stripped = line.strip()
             
             # Ignorer les commandes transactionnelles (notre RestoreService les gère)
-            if (line_stripped.startswith('BEGIN TRANSACTION') or
-                line_stripped.startswith('COMMIT') or
-                line_stripped.startswith('PRAGMA foreign_keys=OFF')):
-                self.log_debug(f"🚫 Ligne transactionnelle ignorée: {line_stripped[:50]}...")
+            if line_stripped.startswith(self.DUMP_SKIPPED_PREFIXES):
+                if debug_enabled:
+                    self.log_debug(f"🚫 Ligne transactionnelle ignorée: {line_stripped[:50]}...")
                 continue
             
             # Ignorer les lignes vides
@@ -316,36 +415,24 @@ class BackupService(BaseService):
             
             # Vérifier les tokens suspects (sessions Django, etc.)
             if self._is_suspicious_token(line_stripped):
-                self.log_warning(f"⚠️ Token suspect filtré: {line_stripped[:50]}...")
+                # Échantillonnage: un avertissement toutes les 256 lignes hors mode debug
+                if debug_enabled or (counters['suspicious_lines'] & 0xff) == 0:
+                    self.log_warning(f"⚠️ Token suspect filtré: {line_stripped[:50]}...")
+                counters['suspicious_lines'] += 1
                 continue
             
-            # Ajouter la ligne nettoyée
-            cleaned_lines.append(line)
-        
-        # Sauvegarder le contenu nettoyé
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(cleaned_lines))
-        
-        removed_lines = len(lines) - len(cleaned_lines)
-        self.log_info(f"✅ Dump nettoyé: {removed_lines} lignes problématiques supprimées")
+            # CRITIQUE: la sauvegarde en cours apparaît avec le statut 'running' dans le dump,
+            # le fichier final doit refléter l'état 'completed' pour les restaurations futures
+            if "'running'" in line:
+                line, corrections = self._correct_running_status(line, current_time)
+                counters['status_corrections'] += corrections
+            
+            counters['kept_lines'] += 1
+            yield line
     
     def _is_suspicious_token(self, line: str) -> bool:
         """Détecte les tokens suspects dans une ligne SQL"""
-        import re
-        
-        # Patterns suspects
-        suspicious_patterns = [
-            r'^[a-z0-9]{32,}$',  # Tokens de session (32+ caractères alphanumériques)
-            r'.*["\'][a-z0-9]{25,}["\'].*',  # Chaînes avec tokens longs
-            r'.*sessionid.*',  # Sessions explicites
-            r'.*csrftoken.*',  # Tokens CSRF
-        ]
-        
-        for pattern in suspicious_patterns:
-            if re.match(pattern, line.lower()):
-                return True
-        
-        return False
+        return SUSPICIOUS_TOKEN_RE.search(line) is not None
     
     def _fix_current_backup_status_in_dump(self, sql_file: Path) -> None:
         """
@@ -356,146 +443,210 @@ class BackupService(BaseService):
         restauration, cela remet la sauvegarde en 'running' au lieu de 'completed'.
         
         Cette méthode trouve et corrige automatiquement ce problème à la source.
-        Supporté pour SQLite, PostgreSQL et MySQL.
+        Supporté pour SQLite, PostgreSQL et MySQL. Le fichier est traité ligne
+        par ligne vers un fichier temporaire, sans être chargé en mémoire.
         """
         self.log_info("🔧 Correction du statut de sauvegarde dans le dump SQL...")
         
+        fixed_file = sql_file.with_name(sql_file.name + '.fixing')
+        
         try:
-            # Lire le contenu du fichier SQL
-            with open(sql_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            import re
-            from django.utils import timezone
-            
-            corrections_made = 0
-            current_time = timezone.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-            
-            # Patterns pour différents formats SQL (SQLite, PostgreSQL, MySQL)
-            patterns = [
-                # SQLite: INSERT INTO backup_manager_backuphistory VALUES(...)
-                r"INSERT INTO ['\"]?backup_manager_backuphistory['\"]? VALUES\s*\(([^)]+)\);",
-                # PostgreSQL: INSERT INTO "backup_manager_backuphistory" (...) VALUES (...);
-                r"INSERT INTO ['\"]?backup_manager_backuphistory['\"]?\s*\([^)]+\)\s+VALUES\s*\(([^)]+)\);",
-                # MySQL: INSERT INTO `backup_manager_backuphistory` VALUES (...);
-                r"INSERT INTO [`'\"]?backup_manager_backuphistory[`'\"]? VALUES\s*\(([^)]+)\);"
-            ]
-            
-            for pattern in patterns:
-                # Chercher et corriger chaque occurrence
-                def replace_running_status(match):
-                    nonlocal corrections_made
-                    values = match.group(1) if match.lastindex >= 1 else match.group(0)
-                    
-                    # Si on trouve 'running' dans les valeurs
-                    if "'running'" in values:
-                        # Remplacer 'running' par 'completed'
-                        corrected_values = values.replace("'running'", "'completed'")
-                        
-                        # Corriger aussi les NULL pour completed_at si nécessaire
-                        # Attention: ne remplacer que le bon NULL (typiquement après le statut)
-                        if ',NULL,' in corrected_values:
-                            corrected_values = corrected_values.replace(',NULL,', f",'{current_time}',", 1)
-                        
-                        corrections_made += 1
-                        self.log_info(f"🔧 Sauvegarde corrigée: 'running' -> 'completed'")
-                        
-                        # Retourner la ligne complète corrigée
-                        return match.group(0).replace(values, corrected_values)
-                    
-                    return match.group(0)
-                
-                # Appliquer les corrections avec le pattern actuel
-                content = re.sub(pattern, replace_running_status, content, flags=re.IGNORECASE)
+            # Cas courant: aucun 'running' dans le dump, pas de réécriture
+            if not self._dump_contains_running_status(sql_file):
+                self.log_info("ℹ️ Aucune correction de statut nécessaire dans le dump SQL")
+                return
             
-            # Réécrire le fichier avec les corrections
+            with open(sql_file, 'r', encoding='utf-8', buffering=self.DUMP_BUFFER_SIZE) as src, \
+                 open(fixed_file, 'w', encoding='utf-8', buffering=self.DUMP_BUFFER_SIZE) as dst:
+                corrections_made = self._write_dump_with_status_fix(src, dst)
+            
+            # Remplacer le fichier uniquement si des corrections ont été faites
             if corrections_made > 0:
-                with open(sql_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                self.log_info(f"✅ {corrections_made} correction(s) de statut appliquée(s) au dump SQL")
-                print(f"🔧 CORRECTION DUMP SQL: {corrections_made} sauvegarde(s) 'running' -> 'completed'")
-            else:
-                self.log_info("ℹ️ Aucune correction de statut nécessaire dans le dump SQL")
+                os.replace(fixed_file, sql_file)
                 
         except Exception as e:
             self.log_warning(f"⚠️ Erreur lors de la correction du dump SQL: {e}")
             # On continue même en cas d'erreur, ce n'est pas critique pour la fonctionnalité
+        finally:
+            fixed_file.unlink(missing_ok=True)
+    
+    @staticmethod
+    def _dump_contains_running_status(sql_file: Path) -> bool:
+        """Recherche rapide (mmap, sans décodage) de 'running' avant toute réécriture"""
+        if sql_file.stat().st_size == 0:
+            return False
+        with open(sql_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped.find(b"'running'") != -1
+    
+    def _write_dump_with_status_fix(self, in_stream: TextIO, out_stream: TextIO) -> int:
+        """
+        Recopie un dump SQL ligne par ligne en corrigeant le statut 'running'
+        des sauvegardes (voir _fix_current_backup_status_in_dump)
+        
+        Returns:
+            Nombre de corrections appliquées
+        """
+        current_time = timezone.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        corrections_made = 0
+        
+        for line in in_stream:
+            if "'running'" in line:
+                line, corrections = self._correct_running_status(line, current_time)
+                corrections_made += corrections
+            out_stream.write(line)
+        
+        if corrections_made > 0:
+            self.log_info(f"✅ {corrections_made} correction(s) de statut appliquée(s) au dump SQL")
+        else:
+            self.log_info("ℹ️ Aucune correction de statut nécessaire dans le dump SQL")
+        
+        return corrections_made
+    
+    def _correct_running_status(self, content: str, current_time: str) -> Tuple[str, int]:
+        """
+        Remplace le statut 'running' par 'completed' dans les INSERT de
+        backup_manager_backuphistory contenus dans `content`
+        
+        Returns:
+            Tuple (contenu corrigé, nombre de corrections)
+        """
+        corrections_made = 0
+        
+        def replace_running_status(match):
+            nonlocal corrections_made
+            values = match.group(1)
+            
+            # Si on trouve 'running' dans les valeurs
+            if "'running'" in values:
+                # Remplacer 'running' par 'completed'
+                corrected_values = values.replace("'running'", "'completed'")
+                
+                # Corriger aussi les NULL pour completed_at si nécessaire
+                # Attention: ne remplacer que le bon NULL (typiquement après le statut)
+                if ',NULL,' in corrected_values:
+                    corrected_values = corrected_values.replace(',NULL,', f",'{current_time}',", 1)
+                
+                corrections_made += 1
+                self.log_info(f"🔧 Sauvegarde corrigée: 'running' -> 'completed'")
+                
+                # Retourner la ligne complète corrigée (découpe autour des valeurs)
+                start, end = match.span(1)
+                return f"{match.string[match.start():start]}{corrected_values}{match.string[end:match.end()]}"
+            
+            return match.group(0)
+        
+        content = BACKUP_HISTORY_INSERT_RE.sub(replace_running_status, content)
+        
+        return content, corrections_made
     
     def _backup_sqlite_fallback(self, backup_dir: Path, db_settings: Dict[str, Any]) -> Dict[str, Any]:
-        """Méthode de fallback: copie directe du fichier SQLite"""
+        """
+        Méthode de fallback: copie de la base via l'API de sauvegarde en ligne SQLite
+        
+        Contrairement à une copie du fichier, Connection.backup() produit une copie
+        cohérente même si la base est modifiée pendant l'opération.
+        """
         self.log_warning("🔄 Utilisation de la méthode de fallback (copie directe)")
         
         db_path = Path(db_settings['NAME'])
         backup_db_path = backup_dir / "database.sqlite3"
-        shutil.copy2(db_path, backup_db_path)
         
-        # Statistiques approximatives
+        source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            destination = sqlite3.connect(str(backup_db_path))
+            try:
+                source.backup(destination, pages=self.SQLITE_BACKUP_PAGES)
+            finally:
+                destination.close()
+        finally:
+            source.close()
+        
         file_size = backup_db_path.stat().st_size
+        stats = self._get_sqlite_stats(backup_db_path)
         self.log_info(f"✅ Base SQLite copiée (fallback): {self.format_size(file_size)}")
         
         return {
-            'tables_count': 1,  # Approximatif
-            'records_count': 0,  # Non calculable facilement
+            'tables_count': stats['tables_count'],
+            'records_count': stats['records_count'],
             'data_size': file_size
         }
     
-    def _analyze_sqlite_dump(self, dump_file: Path) -> Dict[str, Any]:
-        """Analyse un dump SQLite pour extraire des statistiques basiques"""
+    def _get_sqlite_stats(self, db_path: Path) -> Dict[str, Any]:
+        """Compte les tables utilisateur et leurs enregistrements via l'API sqlite3 (lecture seule)"""
         try:
-            with open(dump_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Compter les tables CREATE TABLE
-            import re
-            tables = re.findall(r'CREATE TABLE ["`]?(\w+)["`]?', content, re.IGNORECASE)
-            
-            # Compter les statements INSERT
-            insert_statements = len(re.findall(r'INSERT INTO', content, re.IGNORECASE))
-            
-            # Filtrer les tables système SQLite
-            user_tables = [t for t in tables if not t.startswith('sqlite_')]
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            try:
+                user_tables = [
+                    row[0] for row in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                    )
+                ]
+                records_count = 0
+                for table in user_tables:
+                    quoted = table.replace('"', '""')
+                    records_count += conn.execute(f'SELECT COUNT(*) FROM "{quoted}"').fetchone()[0]
+            finally:
+                conn.close()
             
             return {
                 'tables_count': len(user_tables),
-                'statements_count': insert_statements,
-                'total_tables': len(tables),
+                'records_count': records_count,
                 'user_tables': user_tables
             }
             
-        except Exception as e:
-            self.log_warning(f"⚠️ Impossible d'analyser le dump SQLite: {e}")
+        except sqlite3.Error as e:
+            self.log_warning(f"⚠️ Impossible d'analyser la base SQLite: {e}")
             return {
                 'tables_count': 0,
-                'statements_count': 0,
-                'total_tables': 0,
+                'records_count': 0,
                 'user_tables': []
             }
     
     def _backup_postgresql(self, backup_dir: Path, db_settings: Dict[str, Any]) -> Dict[str, Any]:
-        """Sauvegarde spécifique pour PostgreSQL"""
+        """
+        Sauvegarde spécifique pour PostgreSQL
+        
+        L'export se fait au format répertoire avec plusieurs jobs pg_dump (une
+        table par worker), puis pg_restore le convertit hors connexion en script
+        SQL: le RestoreService continue de rejouer database.sql avec psql.
+        """
         dump_file = backup_dir / self.DATABASE_DUMP_FILENAME
+        dump_dir = backup_dir / self.PG_DUMP_DIRNAME
         
         cmd = [
             'pg_dump',
+            '--format=directory',
+            f"--jobs={self.PG_DUMP_JOBS}",
+            # Répertoire intermédiaire converti aussitôt en SQL: ni compression
+            # (l'archive finale compresse déjà) ni fsync
+            '--compress=0',
+            '--no-sync',
             f"--host={db_settings.get('HOST', 'localhost')}",
             f"--port={db_settings.get('PORT', 5432)}",
             f"--username={db_settings['USER']}",
             f"--dbname={db_settings['NAME']}",
             '--verbose',
             '--no-password',
-            f"--file={dump_file}"
+            f"--file={dump_dir}"
         ]
         
-        env = os.environ.copy()
+        # Environnement hérité tel quel sauf si un mot de passe doit être transmis
+        env = None
         if db_settings.get('PASSWORD'):
-            env['PGPASSWORD'] = db_settings['PASSWORD']
+            env = {**os.environ, 'PGPASSWORD': db_settings['PASSWORD']}
         
         try:
             result = subprocess.run(cmd, env=env, capture_output=True, text=True)
             if result.returncode != 0:
                 raise subprocess.CalledProcessError(result.returncode, cmd, result.stderr)
             
+            # Conversion du format répertoire en script SQL (aucune connexion requise)
+            convert_cmd = ['pg_restore', f"--file={dump_file}", str(dump_dir)]
+            result = subprocess.run(convert_cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, convert_cmd, result.stderr)
+            shutil.rmtree(dump_dir)  # Seul database.sql doit entrer dans l'archive
+            
             # Correction du statut de sauvegarde dans le dump PostgreSQL
             self._fix_current_backup_status_in_dump(dump_file)
             
@@ -523,20 +674,27 @@ class BackupService(BaseService):
             f"--user={db_settings['USER']}",
             f"--password={db_settings.get('PASSWORD', '')}",
             '--single-transaction',
+            '--quick',  # Lecture ligne à ligne côté serveur, sans tout charger en mémoire
             '--routines',
             '--triggers',
             db_settings['NAME']
         ]
         
         try:
-            with open(dump_file, 'w') as f:
-                result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True)
-            
-            if result.returncode != 0:
-                raise subprocess.CalledProcessError(result.returncode, cmd, result.stderr)
-            
-            # Correction du statut de sauvegarde dans le dump MySQL
-            self._fix_current_backup_status_in_dump(dump_file)
+            # Le dump est corrigé (statut de la sauvegarde en cours) pendant son
+            # écriture: pas de seconde passe de lecture/réécriture du fichier
+            with tempfile.TemporaryFile() as stderr_file:
+                with subprocess.Popen(
+                    cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                    bufsize=self.DUMP_BUFFER_SIZE, text=True, encoding='utf-8'
+                ) as proc:
+                    with open(dump_file, 'w', encoding='utf-8', buffering=self.DUMP_BUFFER_SIZE) as out:
+                        self._write_dump_with_status_fix(proc.stdout, out)
+                
+                if proc.returncode != 0:
+                    stderr_file.seek(0)
+                    stderr = stderr_file.read().decode('utf-8', errors='replace')
+                    raise subprocess.CalledProcessError(proc.returncode, cmd, stderr)
             
             file_size = dump_file.stat().st_size
             self.log_info(f"✅ Base MySQL exportée: {self.format_size(file_size)}")
@@ -552,78 +710,155 @@ class BackupService(BaseService):
             raise
     
     def _backup_files(self, backup_dir: Path) -> Dict[str, Any]:
-        """Sauvegarde les fichiers système (media, logs, etc.)"""
-        self.log_info("📁 Phase 3: Sauvegarde des fichiers")
+        """
+        Recense les fichiers système à sauvegarder (media, logs, etc.)
         
-        files_dir = backup_dir / "files"
-        files_dir.mkdir(exist_ok=True)
+        Aucun fichier n'est copié: la liste (source, nom dans l'archive) est
+        transmise à _create_final_archive qui les lit directement depuis leur source.
+        """
+        self.log_info("📁 Phase 3: Sauvegarde des fichiers")
         
-        files_count = 0
+        file_entries: List[Tuple[Path, str]] = []
         
         # Fichiers media si configurés
         if hasattr(settings, 'MEDIA_ROOT') and settings.MEDIA_ROOT:
             media_source = Path(settings.MEDIA_ROOT)
             if media_source.exists():
-                media_dest = files_dir / "media"
-                shutil.copytree(media_source, media_dest, dirs_exist_ok=True)
-                files_count += sum(1 for _ in media_dest.rglob('*') if _.is_file())
-                self.log_info(f"📷 Fichiers media copiés vers {media_dest}")
+                media_entries = self._collect_file_entries(media_source, f"{self.FILES_DIRNAME}/media")
+                file_entries.extend(media_entries)
+                self.log_info(f"📷 {len(media_entries)} fichiers media à archiver depuis {media_source}")
         
         # Logs si le répertoire existe
         logs_source = Path('logs')
         if logs_source.exists():
-            logs_dest = files_dir / "logs"
-            shutil.copytree(logs_source, logs_dest, dirs_exist_ok=True)
-            files_count += sum(1 for _ in logs_dest.rglob('*') if _.is_file())
-            self.log_info(f"📋 Logs copiés vers {logs_dest}")
+            logs_entries = self._collect_file_entries(logs_source, f"{self.FILES_DIRNAME}/logs")
+            file_entries.extend(logs_entries)
+            self.log_info(f"📋 {len(logs_entries)} fichiers de logs à archiver depuis {logs_source}")
+        
+        self.log_info(f"✅ {len(file_entries)} fichiers sauvegardés")
         
-        self.log_info(f"✅ {files_count} fichiers sauvegardés")
+        return {'files_count': len(file_entries), 'file_entries': file_entries}
+    
+    @staticmethod
+    def _collect_file_entries(source_dir: Path, arc_prefix: str = '') -> List[Tuple[Path, str]]:
+        """
+        Liste les fichiers d'un répertoire avec leur nom relatif dans l'archive
         
-        return {'files_count': files_count}
+        Parcours os.scandir: le type des entrées vient du répertoire lui-même,
+        sans stat() par fichier (sauf liens symboliques), et le nom dans
+        l'archive est construit au fil du parcours.
+        """
+        file_entries: List[Tuple[Path, str]] = []
+        pending = [(str(source_dir), arc_prefix)]
+        while pending:
+            directory, prefix = pending.pop()
+            with os.scandir(directory) as it:
+                for entry in it:
+                    arc_name = f"{prefix}/{entry.name}" if prefix else entry.name
+                    # Les liens vers des répertoires ne sont pas suivis (comme rglob)
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((entry.path, arc_name))
+                    elif entry.is_file():
+                        file_entries.append((Path(entry.path), arc_name))
+        return file_entries
     
-    def _create_final_archive(self, backup_dir: Path, backup_name: str, compression: bool) -> Path:
-        """Crée l'archive finale de la sauvegarde"""
-        self.log_info("📦 Phase 4: Création de l'archive")
+    def _create_final_archive(self, backup_dir: Path, backup_name: str, compression: bool,
+                              file_entries: Optional[List[Tuple[Path, str]]] = None) -> BinaryIO:
+        """
+        Crée l'archive finale de la sauvegarde
         
-        archive_name = f"{backup_name}.zip"
-        archive_path = backup_dir.parent / archive_name
+        Args:
+            backup_dir: Répertoire de travail (dump SQL, métadonnées)
+            backup_name: Nom de la sauvegarde
+            compression: Active la compression (zstd si disponible, sinon DEFLATE)
+            file_entries: Fichiers externes (source, nom dans l'archive) écrits en flux
+            
+        Returns:
+            Fichier temporaire anonyme contenant l'archive, repositionné au début
+            (supprimé automatiquement à sa fermeture)
+        """
+        self.log_info(f"📦 Phase 4: Création de l'archive {backup_name}.zip")
         
-        compression_type = zipfile.ZIP_DEFLATED if compression else zipfile.ZIP_STORED
+        archive_file = tempfile.TemporaryFile(dir=backup_dir.parent)
         
-        with zipfile.ZipFile(archive_path, 'w', compression_type) as archive:
-            for file_path in backup_dir.rglob('*'):
-                if file_path.is_file():
-                    arc_name = file_path.relative_to(backup_dir)
-                    archive.write(file_path, arc_name)
+        compression_type = ARCHIVE_COMPRESSION if compression else zipfile.ZIP_STORED
         
-        file_size = archive_path.stat().st_size
+        # Même parcours os.scandir que pour les fichiers système (racine de l'archive)
+        entries = self._collect_file_entries(backup_dir)
+        entries.extend(file_entries or [])
+        
+        try:
+            with zipfile.ZipFile(archive_file, 'w', compression_type, allowZip64=True,
+                                 compresslevel=ARCHIVE_COMPRESSLEVEL) as archive:
+                for source_path, arc_name in entries:
+                    self._write_archive_entry(archive, source_path, arc_name, compression_type)
+        except BaseException:
+            archive_file.close()
+            raise
+        
+        file_size = archive_file.tell()
+        archive_file.seek(0)
         self.log_info(f"✅ Archive créée: {self.format_size(file_size)}")
         
-        return archive_path
+        return archive_file
     
-    def _encrypt_backup(self, archive_path: Path, user) -> Path:
-        """Chiffre la sauvegarde avec clé système transparente"""
-        self.log_info("🔐 Phase 5: Chiffrement automatique")
+    def _write_archive_entry(self, archive: zipfile.ZipFile, source_path: Path, arc_name: str,
+                             compression_type: int) -> None:
+        """Écrit un fichier dans l'archive en flux, par blocs de 1MB"""
+        zinfo = zipfile.ZipInfo.from_file(source_path, arc_name)
+        # Recompresser des données déjà compressées coûte du CPU sans gain de taille
+        if source_path.suffix.lower() in self.NO_COMPRESS_EXTENSIONS:
+            zinfo.compress_type = zipfile.ZIP_STORED
+        else:
+            zinfo.compress_type = compression_type
+            # Niveau public depuis Python 3.13 (zstd); DEFLATE garde le niveau par défaut
+            if ARCHIVE_COMPRESSLEVEL is not None and hasattr(zinfo, 'compress_level'):
+                zinfo.compress_level = ARCHIVE_COMPRESSLEVEL
         
-        encrypted_path = archive_path.with_suffix('.encrypted')
+        with open(source_path, 'rb') as src, archive.open(zinfo, 'w', force_zip64=True) as dst:
+            shutil.copyfileobj(src, dst, self.ARCHIVE_BUFFER_SIZE)
+    
+    def _encrypt_backup(self, archive_file: BinaryIO, encrypted_path: Path, user) -> Tuple[Path, int, str]:
+        """Chiffre la sauvegarde avec clé système transparente (retourne chemin, taille, checksum)"""
+        self.log_info("🔐 Phase 5: Chiffrement automatique")
         
         # Générer la clé système transparente
         encryption_key = self.encryption_service.generate_system_key(user)
         
-        self.encryption_service.encrypt_file_with_key(archive_path, encrypted_path, encryption_key)
+        file_size, checksum = self.encryption_service.encrypt_stream_with_key(
+            archive_file, encrypted_path, encryption_key
+        )
         
         self.log_info(f"🔒 Sauvegarde chiffrée automatiquement: {encrypted_path}")
         
-        return encrypted_path
+        return encrypted_path, file_size, checksum
     
     def _cleanup_backup_directory(self, backup_dir: Path) -> None:
         """Nettoie le répertoire temporaire de sauvegarde"""
         try:
-            shutil.rmtree(backup_dir)
+            self._remove_temp_tree(backup_dir)
             self.log_info(f"🧹 Répertoire temporaire nettoyé: {backup_dir}")
         except Exception as e:
             self.log_warning(f"⚠️ Impossible de nettoyer {backup_dir}: {e}")
     
+    def _remove_temp_tree(self, path: Path) -> None:
+        """
+        Supprime récursivement un répertoire de travail situé sous BACKUP_ROOT/temp
+        
+        Sur POSIX, délègue à `rm -rf` (boucle C unlinkat) bien plus rapide que
+        shutil.rmtree sur les grosses arborescences; shutil.rmtree sert de repli.
+        """
+        temp_root = (self.ensure_backup_directory() / "temp").resolve()
+        target = path.resolve()
+        if target == temp_root or temp_root not in target.parents:
+            raise ValueError(f"Suppression refusée hors du répertoire temporaire: {path}")
+        
+        if os.name == 'posix' and shutil.which('rm'):
+            subprocess.run(['rm', '-rf', '--', str(target)], check=False)
+        
+        if target.exists():
+            shutil.rmtree(target)
+    
     def list_backups(self, config: Optional[BackupConfiguration] = None) -> List[BackupHistory]:
         """Liste les sauvegardes disponibles"""
         queryset = BackupHistory.objects.all()
@@ -673,7 +908,7 @@ class BackupService(BaseService):
         """Nettoie le répertoire temporaire de sauvegarde"""
         try:
             if temp_dir.exists():
-                shutil.rmtree(temp_dir)
+                self._remove_temp_tree(temp_dir)
                 self.log_info(f"🗑️ Répertoire temporaire nettoyé: {temp_dir}")
         except Exception as e:
             self.log_warning(f"⚠️ Impossible de nettoyer le répertoire {temp_dir}: {e}") 
\ No newline at end of file
@@ -5,25 +5,56 @@ Service de base pour tous les services de backup
 import logging
 import hashlib
 import json
+from collections import Counter, deque
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Deque, Iterable, Set, Union
 from django.conf import settings
 from django.utils import timezone
 
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle: repli sur le module json standard
+    orjson = None
+
+
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# Répertoires déjà créés par ce processus: mkdir n'est fait qu'au premier appel.
+# Clé = chemin configuré, une autre valeur de BACKUP_ROOT (override_settings) est recréée.
+_ensured_directories: Set[str] = set()
+
+
+def ensure_directory(path: Union[str, Path]) -> Path:
+    """Crée un répertoire (parents compris) une seule fois par processus et le retourne"""
+    directory = Path(path)
+    key = str(directory)
+    if key not in _ensured_directories:
+        directory.mkdir(parents=True, exist_ok=True)
+        _ensured_directories.add(key)
+    return directory
+
 
 class BaseService:
     """Classe de base pour tous les services de backup"""
     
+    LOG_RING_SIZE = 1000  # Nombre maximal d'entrées conservées dans l'historique
+    
     def __init__(self, logger_name: str = None):
         self.logger = logging.getLogger(logger_name or self.__class__.__name__)
         self.start_time: Optional[datetime] = None
-        self.logs: List[Dict[str, Any]] = []
+        # Historique borné des derniers messages et compteurs par niveau
+        self.logs: Deque[Dict[str, Any]] = deque(maxlen=self.LOG_RING_SIZE)
+        self._log_counts: Counter = Counter()
+        # Évite de formater des messages de debug/info sur les chemins critiques
+        self._debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+        self._info_enabled = self.logger.isEnabledFor(logging.INFO)
     
     def start_operation(self, operation_name: str) -> None:
         """Démarre une opération et initialise le suivi"""
         self.start_time = timezone.now()
-        self.logs = []
+        self.logs.clear()
+        self._log_counts.clear()
         self.log_info(f"🚀 Début de l'opération: {operation_name}")
     
     def end_operation(self, operation_name: str) -> int:
@@ -34,20 +65,27 @@ class BaseService:
             return int(duration)
         return 0
     
-    def log_info(self, message: str, **extra_data) -> None:
+    # Les arguments positionnels suivent la convention du module logging ("%s"):
+    # le message n'est formaté que s'il est émis ou lors du résumé de l'historique.
+    
+    def log_info(self, message: str, *args, **extra_data) -> None:
         """Log d'information avec stockage pour historique"""
-        self.logger.info(message)
-        self._add_log_entry('info', message, extra_data)
+        self.logger.info(message, *args)
+        self._add_log_entry('info', message, extra_data, args)
     
-    def log_warning(self, message: str, **extra_data) -> None:
+    def log_warning(self, message: str, *args, **extra_data) -> None:
         """Log d'avertissement avec stockage pour historique"""
-        self.logger.warning(message)
-        self._add_log_entry('warning', message, extra_data)
+        self.logger.warning(message, *args)
+        self._add_log_entry('warning', message, extra_data, args)
     
-    def log_debug(self, message: str, **extra_data) -> None:
+    def log_debug(self, message: str, *args, **extra_data) -> None:
         """Log de debug avec stockage pour historique"""
-        self.logger.debug(message)
-        self._add_log_entry('debug', message, extra_data)
+        self.logger.debug(message, *args)
+        if not self._debug_enabled:
+            # Compté mais pas conservé quand le niveau debug est désactivé
+            self._log_counts['debug'] += 1
+            return
+        self._add_log_entry('debug', message, extra_data, args)
     
     def log_error(self, message: str, exception: Exception = None, **extra_data) -> None:
         """Log d'erreur avec stockage pour historique"""
@@ -55,69 +93,115 @@ class BaseService:
         extra_data['exception'] = str(exception) if exception else None
         self._add_log_entry('error', message, extra_data)
     
-    def _add_log_entry(self, level: str, message: str, extra_data: Dict[str, Any]) -> None:
-        """Ajoute une entrée au log interne"""
+    def _add_log_entry(self, level: str, message: str, extra_data: Dict[str, Any], args: tuple = ()) -> None:
+        """Ajoute une entrée au log interne (horodatage et message formatés seulement au résumé)"""
+        self._log_counts[level] += 1
         self.logs.append({
-            'timestamp': timezone.now().isoformat(),
+            'timestamp': timezone.now(),
             'level': level,
             'message': message,
+            'args': args,
             'extra_data': extra_data
         })
     
     def get_logs_summary(self) -> Dict[str, Any]:
         """Retourne un résumé des logs de l'opération"""
         return {
-            'total_entries': len(self.logs),
-            'info_count': len([log for log in self.logs if log['level'] == 'info']),
-            'warning_count': len([log for log in self.logs if log['level'] == 'warning']),
-            'debug_count': len([log for log in self.logs if log['level'] == 'debug']),
-            'error_count': len([log for log in self.logs if log['level'] == 'error']),
-            'logs': self.logs
+            'total_entries': sum(self._log_counts.values()),
+            'info_count': self._log_counts['info'],
+            'warning_count': self._log_counts['warning'],
+            'debug_count': self._log_counts['debug'],
+            'error_count': self._log_counts['error'],
+            'logs': [
+                {
+                    'timestamp': entry['timestamp'].isoformat(),
+                    'level': entry['level'],
+                    'message': entry['message'] % entry['args'] if entry['args'] else entry['message'],
+                    'extra_data': entry['extra_data']
+                }
+                for entry in self.logs
+            ]
         }
     
     @staticmethod
     def calculate_checksum(file_path: Path) -> str:
         """Calcule le checksum SHA-256 d'un fichier"""
-        hash_sha256 = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_sha256.update(chunk)
-        return hash_sha256.hexdigest()
+        # file_digest lit par readinto() dans un tampon réutilisé, sans boucle Python;
+        # fichier non bufferisé pour éviter une copie par le BufferedReader
+        with open(file_path, "rb", buffering=0) as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
     
     @staticmethod
     def format_size(size_bytes: int) -> str:
         """Formate une taille en bytes en format lisible"""
         if size_bytes == 0:
             return "0 B"
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        import math
-        i = int(math.floor(math.log(size_bytes, 1024)))
-        p = math.pow(1024, i)
-        s = round(size_bytes / p, 2)
-        return f"{s} {size_names[i]}"
+        # Unité déduite du nombre de bits (10 bits par facteur 1024), sans flottant
+        unit_index = min((int(size_bytes).bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+        return f"{round(size_bytes / (1 << (unit_index * 10)), 2)} {SIZE_UNITS[unit_index]}"
     
     @staticmethod
     def ensure_backup_directory() -> Path:
         """S'assure que le répertoire de sauvegarde existe"""
-        backup_dir = Path(getattr(settings, 'BACKUP_ROOT', 'backups'))
-        backup_dir.mkdir(parents=True, exist_ok=True)
-        return backup_dir
+        return ensure_directory(getattr(settings, 'BACKUP_ROOT', 'backups'))
     
     def save_json_file(self, data: Dict[str, Any], file_path: Path, indent: int = 2) -> None:
         """Sauvegarde des données JSON dans un fichier"""
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=indent, ensure_ascii=False, default=str)
+            # orjson n'indente que sur 2 espaces et produit directement de l'UTF-8
+            if orjson is not None and indent == 2:
+                Path(file_path).write_bytes(orjson.dumps(
+                    data,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_DATACLASS,
+                    default=str
+                ))
+            else:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=indent, ensure_ascii=False, default=str)
             self.log_info(f"📄 Fichier JSON sauvegardé: {file_path}")
         except Exception as e:
             self.log_error(f"❌ Erreur lors de la sauvegarde JSON: {file_path}", e)
             raise
     
+    @staticmethod
+    def _encode_json_record(record: Any) -> bytes:
+        """Encode un enregistrement JSON compact en UTF-8"""
+        if orjson is not None:
+            return orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS, default=str)
+        return json.dumps(record, ensure_ascii=False, default=str).encode('utf-8')
+    
+    def save_json_stream(self, records: Iterable[Any], file_path: Path) -> int:
+        """
+        Écrit une liste JSON enregistrement par enregistrement, sans construire le JSON complet en mémoire
+        
+        Le fichier est un tableau JSON (format dumpdata/loaddata).
+        
+        Returns:
+            Nombre d'enregistrements écrits
+        """
+        count = 0
+        try:
+            with open(file_path, 'wb') as f:
+                f.write(b'[')
+                for record in records:
+                    f.write(b',\n' if count else b'\n')
+                    f.write(self._encode_json_record(record))
+                    count += 1
+                f.write(b'\n]\n')
+            self.log_info(f"📄 Fichier JSON écrit en flux: {file_path} ({count} enregistrements)")
+            return count
+        except Exception as e:
+            self.log_error(f"❌ Erreur lors de l'écriture JSON en flux: {file_path}", e)
+            raise
+    
     def load_json_file(self, file_path: Path) -> Dict[str, Any]:
         """Charge des données JSON depuis un fichier"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if orjson is not None:
+                data = orjson.loads(Path(file_path).read_bytes())
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
             self.log_info(f"📖 Fichier JSON chargé: {file_path}")
             return data
         except Exception as e:
@@ -3,12 +3,38 @@ Service de nettoyage automatique des fichiers temporaires
 """
 
 import os
-import shutil
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional, Union, Set, Iterator
+from datetime import datetime
+from typing import Dict, List, Tuple, Optional, Union, Set, Iterator, NamedTuple, Callable, Any
 from django.conf import settings
-from .base_service import BaseService
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from .base_service import BaseService, ensure_directory
+
+
+# Nettoyage automatique hors du chemin critique des sauvegardes et restaurations (un seul à la fois)
+CLEANUP_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='backup-cleanup')
+
+
+def _run_cleanup_task(task: Callable[[], Any]) -> Any:
+    """Exécute un nettoyage dans le thread dédié et ferme ses connexions DB"""
+    try:
+        return task()
+    finally:
+        # Les connexions Django sont propres à chaque thread
+        connections.close_all()
+
+
+class ScanEntry(NamedTuple):
+    """Élément de premier niveau retenu pour suppression"""
+    path: Path
+    size: int  # Taille du fichier (0 pour un répertoire, calculée à la suppression)
+    is_dir: bool
 
 
 class CleanupService(BaseService):
@@ -22,45 +48,77 @@ class CleanupService(BaseService):
         'storage': {'max_age_hours': 1, 'recursive': False, 'orphan_check': True}
     }
     
+    # Noms de fichiers déchiffrés temporaires (une seule recherche, sans lower())
+    DECRYPTED_NAME_RE = re.compile(r'decrypted|temp', re.IGNORECASE)
+    
     # Cache TTL en secondes (5 minutes)
     CACHE_TTL = 300
     
-    def __init__(self):
+    # Suppressions simultanées (utile surtout sur stockage réseau)
+    DELETE_WORKERS = 8
+    
+    # Nettoyage automatique au plus une fois par intervalle (secondes), toutes demandes confondues
+    AUTO_CLEANUP_MIN_INTERVAL = 300
+    AUTO_CLEANUP_CACHE_KEY = 'backup_manager:last_auto_cleanup'
+    
+    # Au-delà de ce nombre de fichiers, suppression par lots relative au descripteur du répertoire
+    BATCH_UNLINK_THRESHOLD = 1000
+    BATCH_UNLINK_SIZE = 256
+    
+    def __init__(self) -> None:
         super().__init__('CleanupService')
         self.backup_root = self._validate_backup_root()
         # Cache optimisé pour les fichiers référencés
-        self._referenced_files_cache: Optional[Set[Path]] = None
+        self._referenced_files_cache: Optional[Set[str]] = None
         self._cache_timestamp: Optional[datetime] = None
     
+    @classmethod
+    def schedule_auto_cleanup(cls, task: Callable[[], Any]) -> bool:
+        """
+        Planifie un nettoyage automatique en arrière-plan
+        
+        Les demandes rapprochées (sauvegardes ou restaurations successives) sont
+        regroupées: seule la première de chaque intervalle est exécutée.
+        
+        Returns:
+            True si le nettoyage a été planifié, False s'il a été ignoré
+        """
+        # cache.add est atomique: une seule demande par intervalle obtient la clé
+        if not cache.add(cls.AUTO_CLEANUP_CACHE_KEY, timezone.now().isoformat(), cls.AUTO_CLEANUP_MIN_INTERVAL):
+            return False
+        CLEANUP_EXECUTOR.submit(_run_cleanup_task, task)
+        return True
+    
     def _validate_backup_root(self) -> Path:
         """Valide et retourne le répertoire racine des backups"""
         if not hasattr(settings, 'BACKUP_ROOT'):
             raise ValueError("BACKUP_ROOT n'est pas configuré dans les settings Django")
         
-        backup_root = Path(settings.BACKUP_ROOT)
-        backup_root.mkdir(parents=True, exist_ok=True)
-        return backup_root
+        return ensure_directory(settings.BACKUP_ROOT)
     
-    def _calculate_cutoff_time(self, max_age_hours: int) -> datetime:
-        """Calcule le temps de coupure pour un âge maximum donné"""
-        return datetime.now() - timedelta(hours=max_age_hours)
+    def _calculate_cutoff_time(self, max_age_hours: int) -> float:
+        """
+        Calcule le temps de coupure (timestamp) pour un âge maximum donné
+        
+        Comparé directement aux st_mtime: aucun datetime construit par fichier.
+        """
+        return time.time() - max_age_hours * 3600
     
-    def _get_file_stats_safe(self, file_path: Path) -> Tuple[datetime, int, bool]:
-        """Récupère l'âge, la taille et l'existence d'un fichier de manière sécurisée"""
+    def _get_file_stats_safe(self, file_path: Path) -> Tuple[float, int, bool]:
+        """Récupère la date de modification (timestamp), la taille et l'existence d'un fichier"""
         try:
-            stat_info = file_path.stat()
-            return (
-                datetime.fromtimestamp(stat_info.st_mtime),
-                stat_info.st_size,
-                True
-            )
+            stat_info = file_path.stat(follow_symlinks=False)
+            return stat_info.st_mtime, stat_info.st_size, True
         except OSError:
-            return datetime.now(), 0, False
+            return time.time(), 0, False
     
-    def _is_file_old_enough(self, file_path: Path, cutoff_time: datetime) -> bool:
-        """Vérifie si un fichier est assez ancien pour être supprimé"""
-        file_time, _, exists = self._get_file_stats_safe(file_path)
-        return exists and file_time < cutoff_time
+    def _is_file_old_enough(self, file_path: Path, cutoff_time: float,
+                            stat_info: Optional[os.stat_result] = None) -> bool:
+        """Vérifie si un fichier est assez ancien pour être supprimé (stat fourni réutilisé)"""
+        if stat_info is not None:
+            return stat_info.st_mtime < cutoff_time
+        mtime, _, exists = self._get_file_stats_safe(file_path)
+        return exists and mtime < cutoff_time
     
     def _get_directory_stats_optimized(self, directory: Path, max_depth: Optional[int] = None) -> Tuple[int, int]:
         """
@@ -80,43 +138,67 @@ class CleanupService(BaseService):
         file_count = 0
         
         try:
-            # Utiliser un générateur avec limitation de profondeur si spécifiée
-            if max_depth is not None:
-                file_iterator = self._limited_rglob(directory, max_depth)
-            else:
-                file_iterator = directory.rglob("*")
-            
-            for file_path in file_iterator:
-                if file_path.is_file():
-                    try:
-                        total_size += file_path.stat().st_size
-                        file_count += 1
-                    except OSError:
-                        # Compter le fichier même si on ne peut pas avoir sa taille
-                        file_count += 1
+            # Parcours os.scandir: type et taille viennent des DirEntry (pas de Path par entrée)
+            pending = deque([(os.fspath(directory), 0)])
+            while pending:
+                current, depth = pending.pop()
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if max_depth is None or depth < max_depth:
+                                pending.append((entry.path, depth + 1))
+                        elif entry.is_file(follow_symlinks=False):
+                            file_count += 1
+                            try:
+                                total_size += entry.stat(follow_symlinks=False).st_size
+                            except OSError:
+                                # Compter le fichier même si on ne peut pas avoir sa taille
+                                pass
         except OSError as e:
             self.log_warning(f"⚠️ Erreur lors du parcours de {directory}: {e}")
         
         return total_size, file_count
     
-    def _limited_rglob(self, directory: Path, max_depth: int) -> Iterator[Path]:
-        """Générateur pour parcourir un répertoire avec une profondeur limitée"""
-        def _walk_limited(path: Path, current_depth: int):
-            if current_depth > max_depth:
-                return
-            
+    def _limited_file_scan(self, directory: Path, max_depth: int) -> Iterator[Tuple[Path, os.stat_result]]:
+        """
+        Générateur des fichiers d'un répertoire avec une profondeur limitée
+        
+        Chaque fichier est fourni avec son stat (mis en cache par le DirEntry),
+        réutilisé pour l'âge, la sélection et la taille libérée.
+        
+        Les entrées d'un répertoire sont lues d'un bloc avant d'être fournies:
+        le descripteur est fermé avant que l'appelant ne supprime quoi que ce
+        soit, et un générateur abandonné ne garde aucun répertoire ouvert.
+        
+        La racine est normalisée une fois: les chemins fournis sont absolus et
+        normalisés, comparables tels quels aux fichiers référencés.
+        """
+        pending = deque([(self._normalize_path(directory), 0)])
+        while pending:
+            current, depth = pending.pop()
             try:
-                for item in path.iterdir():
-                    yield item
-                    if item.is_dir():
-                        yield from _walk_limited(item, current_depth + 1)
+                with os.scandir(current) as it:
+                    entries = list(it)
             except OSError:
-                pass
-        
-        return _walk_limited(directory, 0)
+                continue
+            
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if depth < max_depth:
+                        pending.append((entry.path, depth + 1))
+                elif entry.is_file():
+                    try:
+                        yield Path(entry.path), entry.stat()
+                    except OSError:
+                        continue
     
-    def _get_referenced_files_cached(self) -> Set[Path]:
-        """Récupère tous les fichiers référencés en base avec cache optimisé"""
+    def _get_referenced_files_cached(self) -> Set[str]:
+        """
+        Récupère tous les fichiers référencés en base avec cache optimisé
+        
+        Les chemins sont stockés sous forme de chaînes absolues normalisées
+        (voir _normalize_path): comparaison par hash de str, sans objets Path.
+        """
         now = datetime.now()
         
         # Vérifier la validité du cache
@@ -132,14 +214,15 @@ class CleanupService(BaseService):
             from ..models import BackupHistory
             
             referenced_files = set()
-            # Optimiser la requête avec select_related si nécessaire
-            for backup in BackupHistory.objects.filter(file_path__isnull=False).only('file_path'):
-                if backup.file_path:
-                    # Normaliser le chemin
-                    if os.path.isabs(backup.file_path):
-                        referenced_files.add(Path(backup.file_path))
+            # values_list: pas d'instanciation de modèles, uniquement les chemins
+            file_paths = BackupHistory.objects.filter(file_path__isnull=False).values_list('file_path', flat=True)
+            for file_path in file_paths:
+                if file_path:
+                    # Normaliser le chemin (relatif = relatif à BACKUP_ROOT)
+                    if os.path.isabs(file_path):
+                        referenced_files.add(self._normalize_path(file_path))
                     else:
-                        referenced_files.add(self.backup_root / backup.file_path)
+                        referenced_files.add(self._normalize_path(os.path.join(self.backup_root, file_path)))
             
             # Mettre à jour le cache
             self._referenced_files_cache = referenced_files
@@ -152,8 +235,14 @@ class CleanupService(BaseService):
             self.log_error(f"❌ Erreur lors du rechargement du cache: {e}")
             return self._referenced_files_cache or set()
     
-    def _should_delete_file(self, file_path: Path, cutoff_time: datetime, 
-                           context: str = "general") -> bool:
+    @staticmethod
+    def _normalize_path(path: Union[str, Path]) -> str:
+        """Chemin absolu normalisé (calcul sur la chaîne, sans accès disque)"""
+        return os.path.abspath(path)
+    
+    def _should_delete_file(self, file_path: Path, cutoff_time: float, 
+                           context: str = "general",
+                           stat_info: Optional[os.stat_result] = None) -> bool:
         """
         Détermine si un fichier doit être supprimé selon le contexte
         
@@ -161,26 +250,29 @@ class CleanupService(BaseService):
             file_path: Chemin du fichier
             cutoff_time: Temps de coupure
             context: Contexte ('orphan', 'decrypted', 'general')
+            stat_info: stat déjà lu lors du parcours (fichier régulier), évite un nouvel appel;
+                       le chemin vient alors d'un parcours et est déjà normalisé
         """
-        if not file_path.is_file():
+        if stat_info is None and not file_path.is_file():
             return False
         
         # Vérifications communes
-        if not self._is_file_old_enough(file_path, cutoff_time):
+        if not self._is_file_old_enough(file_path, cutoff_time, stat_info):
             return False
         
         # Vérifications spécifiques au contexte
         if context == "orphan":
             referenced_files = self._get_referenced_files_cached()
-            return file_path not in referenced_files
+            # Chemin issu d'un parcours: str déjà normalisée, seule la recherche dans le set reste
+            path_key = os.fspath(file_path) if stat_info is not None else self._normalize_path(file_path)
+            return path_key not in referenced_files
         
         elif context == "decrypted":
-            filename_lower = file_path.name.lower()
-            return 'decrypted' in filename_lower or 'temp' in filename_lower
+            return self.DECRYPTED_NAME_RE.search(file_path.name) is not None
         
         return True  # Contexte général
     
-    def _cleanup_directory_generic(self, directory: Path, cutoff_time: datetime,
+    def _cleanup_directory_generic(self, directory: Path, cutoff_time: float,
                                   context: str = "general") -> Dict[str, int]:
         """
         Méthode générique pour nettoyer un répertoire
@@ -195,30 +287,115 @@ class CleanupService(BaseService):
         
         stats = {'files_deleted': 0, 'size_freed': 0, 'directories_removed': 0}
         
+        # Sélection des éléments à supprimer, puis suppression en parallèle
+        candidates = self._scan_directory(directory, cutoff_time, context)
+        if not candidates:
+            return stats
+        
+        files = [item for item in candidates if not item.is_dir]
+        if len(files) > self.BATCH_UNLINK_THRESHOLD and self._supports_dir_fd_removal():
+            # Gros volumes: les fichiers partent par lots, les répertoires un par un
+            directories = [item for item in candidates if item.is_dir]
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                batches = [files[i:i + self.BATCH_UNLINK_SIZE]
+                           for i in range(0, len(files), self.BATCH_UNLINK_SIZE)]
+                tasks = [(self._unlink_batch, dir_fd, batch) for batch in batches]
+                tasks += [(self._delete_item_safe, item) for item in directories]
+                self._run_delete_tasks(tasks, stats)
+            finally:
+                os.close(dir_fd)
+        else:
+            self._run_delete_tasks([(self._delete_item_safe, item) for item in candidates], stats)
+        
+        return stats
+    
+    def _run_delete_tasks(self, tasks: List[Tuple], stats: Dict[str, int]) -> None:
+        """Exécute les suppressions en parallèle et cumule leurs stats"""
+        # Chaque tâche remplit ses propres stats, fusionnées ensuite (pas de verrou)
+        with ThreadPoolExecutor(max_workers=min(self.DELETE_WORKERS, len(tasks))) as executor:
+            futures = [executor.submit(*task) for task in tasks]
+            for future in futures:
+                for key, value in future.result().items():
+                    stats[key] += value
+    
+    def _unlink_batch(self, dir_fd: int, batch: List[ScanEntry]) -> Dict[str, int]:
+        """
+        Supprime un lot de fichiers d'un même répertoire via unlinkat(dir_fd, nom)
+        
+        Un seul descripteur pour tout le lot: aucune résolution du chemin complet
+        par fichier, et une tâche de pool pour des centaines de suppressions.
+        """
+        stats = {'files_deleted': 0, 'size_freed': 0, 'directories_removed': 0}
+        for item in batch:
+            try:
+                os.unlink(item.path.name, dir_fd=dir_fd)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self.log_warning(f"⚠️ Impossible de supprimer {item.path}: {e}")
+                continue
+            stats['files_deleted'] += 1
+            stats['size_freed'] += item.size
+        
+        if self._info_enabled:
+            self.log_info(f"  🗑️ Suppression par lot: {stats['files_deleted']} fichiers ({self.format_size(stats['size_freed'])})")
+        return stats
+    
+    def _scan_directory(self, directory: Path, cutoff_time: float,
+                        context: str = "general") -> List[ScanEntry]:
+        """
+        Liste en un seul parcours os.scandir les éléments de premier niveau à supprimer
+        
+        Partagé par le nettoyage et sa simulation: la date et la taille viennent
+        du même stat() que la sélection, sans relecture ultérieure.
+        """
+        candidates: List[ScanEntry] = []
+        
         try:
-            for item in directory.iterdir():
-                if not self._is_file_old_enough(item, cutoff_time):
-                    continue
-                
-                if item.is_file():
-                    if self._should_delete_file(item, cutoff_time, context):
-                        self._delete_file_safe(item, stats)
-                elif item.is_dir():
-                    self._delete_directory_safe(item, stats)
+            # Racine normalisée: chemins des entrées comparables aux fichiers référencés
+            with os.scandir(self._normalize_path(directory)) as it:
+                for entry in it:
+                    try:
+                        stat_info = entry.stat()
+                    except OSError:
+                        continue
+                    if stat_info.st_mtime >= cutoff_time:
+                        continue
                     
+                    if entry.is_dir(follow_symlinks=False):
+                        candidates.append(ScanEntry(Path(entry.path), 0, True))
+                    elif entry.is_file():
+                        file_path = Path(entry.path)
+                        # Le contexte général n'ajoute aucune règle à l'âge du fichier
+                        if context == "general" or self._should_delete_file(file_path, cutoff_time, context, stat_info):
+                            candidates.append(ScanEntry(file_path, stat_info.st_size, False))
         except OSError as e:
             self.log_warning(f"⚠️ Erreur lors du parcours de {directory}: {e}")
         
+        return candidates
+    
+    def _delete_item_safe(self, item: ScanEntry) -> Dict[str, int]:
+        """Supprime un fichier ou un répertoire et retourne ses stats de suppression"""
+        stats = {'files_deleted': 0, 'size_freed': 0, 'directories_removed': 0}
+        if item.is_dir:
+            self._delete_directory_safe(item.path, stats)
+        else:
+            self._delete_file_safe(item.path, stats, item.size)
         return stats
     
-    def _delete_file_safe(self, file_path: Path, stats: Dict[str, int]):
+    def _delete_file_safe(self, file_path: Path, stats: Dict[str, int], file_size: Optional[int] = None) -> None:
         """Supprime un fichier de manière sécurisée et met à jour les stats"""
         try:
-            _, file_size, exists = self._get_file_stats_safe(file_path)
-            if not exists:
-                return
+            # Taille déjà connue si le fichier vient d'un parcours (stat du DirEntry)
+            if file_size is None:
+                _, file_size, exists = self._get_file_stats_safe(file_path)
+                if not exists:
+                    return
             
-            self.log_info(f"  🗑️ Suppression: {file_path.name} ({self.format_size(file_size)})")
+            # Message par fichier: formaté seulement si le niveau info est actif
+            if self._info_enabled:
+                self.log_info(f"  🗑️ Suppression: {file_path.name} ({self.format_size(file_size)})")
             file_path.unlink()
             
             stats['files_deleted'] += 1
@@ -227,14 +404,14 @@ class CleanupService(BaseService):
         except OSError as e:
             self.log_warning(f"⚠️ Impossible de supprimer {file_path}: {e}")
     
-    def _delete_directory_safe(self, dir_path: Path, stats: Dict[str, int]):
+    def _delete_directory_safe(self, dir_path: Path, stats: Dict[str, int]) -> None:
         """Supprime un répertoire de manière sécurisée et met à jour les stats"""
         try:
-            # Calculer les stats avant suppression
-            dir_size, file_count = self._get_directory_stats_optimized(dir_path)
+            # Taille et nombre de fichiers cumulés pendant la suppression (un seul parcours)
+            dir_size, file_count = self._rmtree_with_stats(dir_path)
             
-            self.log_info(f"  🗑️ Suppression: {dir_path.name}/ ({self.format_size(dir_size)}, {file_count} fichiers)")
-            shutil.rmtree(dir_path)
+            if self._info_enabled:
+                self.log_info(f"  🗑️ Suppression: {dir_path.name}/ ({self.format_size(dir_size)}, {file_count} fichiers)")
             
             stats['files_deleted'] += file_count
             stats['size_freed'] += dir_size
@@ -243,6 +420,87 @@ class CleanupService(BaseService):
         except OSError as e:
             self.log_warning(f"⚠️ Impossible de supprimer {dir_path}: {e}")
     
+    def _rmtree_with_stats(self, dir_path: Path) -> Tuple[int, int]:
+        """
+        Supprime un répertoire récursivement et retourne (taille, nombre de fichiers)
+        
+        Chaque répertoire est ouvert une seule fois: ses entrées sont supprimées
+        relativement à ce descripteur (unlinkat/rmdir avec dir_fd), sans résolution
+        du chemin complet, et les tailles viennent des DirEntry du même parcours.
+        """
+        if not self._supports_dir_fd_removal():
+            return self._rmtree_by_path(os.fspath(dir_path))
+        
+        parent_fd = os.open(dir_path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            return self._rmtree_at(dir_path.name, parent_fd)
+        finally:
+            os.close(parent_fd)
+    
+    @staticmethod
+    def _supports_dir_fd_removal() -> bool:
+        """Vérifie que la plateforme permet unlink/rmdir relatifs à un descripteur"""
+        return (
+            os.unlink in os.supports_dir_fd
+            and os.rmdir in os.supports_dir_fd
+            and os.scandir in os.supports_fd
+        )
+    
+    def _rmtree_by_path(self, path: str) -> Tuple[int, int]:
+        """Variante par chemins de _rmtree_at (plateformes sans dir_fd), toujours en un seul parcours"""
+        total_size = 0
+        file_count = 0
+        
+        with os.scandir(path) as it:
+            entries = list(it)
+        
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                sub_size, sub_count = self._rmtree_by_path(entry.path)
+                total_size += sub_size
+                file_count += sub_count
+                continue
+            
+            try:
+                total_size += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass  # Compter le fichier même sans sa taille
+            os.unlink(entry.path)
+            file_count += 1
+        
+        os.rmdir(path)
+        return total_size, file_count
+    
+    def _rmtree_at(self, name: str, parent_fd: int) -> Tuple[int, int]:
+        """Supprime le répertoire `name` relatif à `parent_fd` (voir _rmtree_with_stats)"""
+        # O_NOFOLLOW: un lien symbolique n'est jamais traversé
+        dir_fd = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=parent_fd)
+        total_size = 0
+        file_count = 0
+        
+        try:
+            with os.scandir(dir_fd) as it:
+                entries = list(it)
+            
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_size, sub_count = self._rmtree_at(entry.name, dir_fd)
+                    total_size += sub_size
+                    file_count += sub_count
+                    continue
+                
+                try:
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass  # Compter le fichier même sans sa taille
+                os.unlink(entry.name, dir_fd=dir_fd)
+                file_count += 1
+        finally:
+            os.close(dir_fd)
+        
+        os.rmdir(name, dir_fd=parent_fd)
+        return total_size, file_count
+    
     def cleanup_all_temporary_files(self, max_age_hours: int = 24) -> Dict[str, Union[Dict[str, int], int, float]]:
         """
         Nettoie tous les fichiers temporaires de manière optimisée
@@ -319,9 +577,9 @@ class CleanupService(BaseService):
                 
             try:
                 # Limiter la profondeur pour éviter les parcours trop longs
-                for file_path in self._limited_rglob(search_dir, max_depth=3):
-                    if self._should_delete_file(file_path, cutoff_time, "decrypted"):
-                        self._delete_file_safe(file_path, stats)
+                for file_path, stat_info in self._limited_file_scan(search_dir, max_depth=3):
+                    if self._should_delete_file(file_path, cutoff_time, "decrypted", stat_info):
+                        self._delete_file_safe(file_path, stats, stat_info.st_size)
                         
             except OSError as e:
                 self.log_warning(f"⚠️ Erreur lors du parcours de {search_dir}: {e}")
@@ -342,9 +600,9 @@ class CleanupService(BaseService):
         
         try:
             # Utiliser un parcours limité pour de meilleures performances
-            for file_path in self._limited_rglob(storage_dir, max_depth=5):
-                if self._should_delete_file(file_path, cutoff_time, "orphan"):
-                    self._delete_file_safe(file_path, stats)
+            for file_path, stat_info in self._limited_file_scan(storage_dir, max_depth=5):
+                if self._should_delete_file(file_path, cutoff_time, "orphan", stat_info):
+                    self._delete_file_safe(file_path, stats, stat_info.st_size)
                     
         except OSError as e:
             self.log_warning(f"⚠️ Erreur lors du parcours du storage: {e}")
@@ -388,7 +646,7 @@ class CleanupService(BaseService):
             }
         }
     
-    def _dry_run_directory_optimized(self, directory: Path, cutoff_time: datetime) -> Dict[str, int]:
+    def _dry_run_directory_optimized(self, directory: Path, cutoff_time: float) -> Dict[str, int]:
         """Version optimisée de la simulation de nettoyage d'un répertoire"""
         if not directory.exists():
             return {'files_to_delete': 0, 'size_to_free': 0, 'directories_to_remove': 0}
@@ -397,24 +655,16 @@ class CleanupService(BaseService):
         size_to_free = 0
         directories_to_remove = 0
         
-        try:
-            for item in directory.iterdir():
-                if not self._is_file_old_enough(item, cutoff_time):
-                    continue
-                
-                if item.is_file():
-                    _, file_size, exists = self._get_file_stats_safe(item)
-                    if exists:
-                        files_to_delete += 1
-                        size_to_free += file_size
-                elif item.is_dir():
-                    dir_size, file_count = self._get_directory_stats_optimized(item)
-                    files_to_delete += file_count
-                    size_to_free += dir_size
-                    directories_to_remove += 1
-                    
-        except OSError as e:
-            self.log_warning(f"⚠️ Erreur lors de la simulation pour {directory}: {e}")
+        # Même sélection que le nettoyage réel (_cleanup_directory_generic)
+        for item in self._scan_directory(directory, cutoff_time):
+            if item.is_dir:
+                dir_size, file_count = self._get_directory_stats_optimized(item.path)
+                files_to_delete += file_count
+                size_to_free += dir_size
+                directories_to_remove += 1
+            else:
+                files_to_delete += 1
+                size_to_free += item.size
         
         return {
             'files_to_delete': files_to_delete,
@@ -434,11 +684,10 @@ class CleanupService(BaseService):
         size_to_free = 0
         
         try:
-            for file_path in self._limited_rglob(storage_dir, max_depth=5):
-                if self._should_delete_file(file_path, cutoff_time, "orphan"):
+            for file_path, stat_info in self._limited_file_scan(storage_dir, max_depth=5):
+                if self._should_delete_file(file_path, cutoff_time, "orphan", stat_info):
                     files_to_delete += 1
-                    _, file_size, _ = self._get_file_stats_safe(file_path)
-                    size_to_free += file_size
+                    size_to_free += stat_info.st_size
                     
         except OSError as e:
             self.log_warning(f"⚠️ Erreur lors de la simulation des orphelins: {e}")
@@ -459,11 +708,10 @@ class CleanupService(BaseService):
                 continue
                 
             try:
-                for file_path in self._limited_rglob(search_dir, max_depth=3):
-                    if self._should_delete_file(file_path, cutoff_time, "decrypted"):
+                for file_path, stat_info in self._limited_file_scan(search_dir, max_depth=3):
+                    if self._should_delete_file(file_path, cutoff_time, "decrypted", stat_info):
                         files_to_delete += 1
-                        _, file_size, _ = self._get_file_stats_safe(file_path)
-                        size_to_free += file_size
+                        size_to_free += stat_info.st_size
                         
             except OSError as e:
                 self.log_warning(f"⚠️ Erreur simulation déchiffrés dans {search_dir}: {e}")
@@ -496,18 +744,6 @@ class CleanupService(BaseService):
         _, count = self._get_directory_stats_optimized(directory)
         return count
     
-    def format_size(self, size_bytes: int) -> str:
-        """Formate une taille en bytes en format lisible"""
-        if size_bytes == 0:
-            return "0 B"
-        
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if size_bytes < 1024.0:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024.0
-        
-        return f"{size_bytes:.1f} PB"
-    
     def get_cleanup_stats(self) -> Dict[str, Dict[str, Union[int, str]]]:
         """Obtient les statistiques de l'espace disque et des fichiers temporaires"""
         stats = {}
@@ -531,7 +767,7 @@ class CleanupService(BaseService):
         
         return stats
     
-    def clear_cache(self):
+    def clear_cache(self) -> None:
         """Efface le cache des fichiers référencés"""
         self._referenced_files_cache = None
         self._cache_timestamp = None
@@ -2,16 +2,128 @@
 Service de chiffrement pour les sauvegardes
 """
 
+import io
 import os
+import errno
+import shutil
+import mmap
 import hashlib
+import hmac
+import itertools
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from functools import cached_property
 from pathlib import Path
-from typing import Optional
-from cryptography.fernet import Fernet
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
 from .base_service import BaseService
 import base64
+import platform
+
+try:
+    # Implémentation C de PBKDF2 (même signature que hashlib.pbkdf2_hmac)
+    from fastpbkdf2 import pbkdf2_hmac as fast_pbkdf2_hmac
+except ImportError:  # Dépendance optionnelle: repli sur PBKDF2HMAC de cryptography
+    fast_pbkdf2_hmac = None
+
+try:
+    # Implémentation Rust de Fernet (même format de jeton, clé base64 en str)
+    from rfernet import Fernet
+except ImportError:  # Dépendance optionnelle: repli sur cryptography
+    from cryptography.fernet import Fernet
+
+try:
+    import zstandard
+except ImportError:  # Dépendance optionnelle: chiffrement par mot de passe sans compression
+    zstandard = None
+
+
+# Chiffrement dans un tampon fourni par l'appelant (cryptography >= 46)
+AESGCM_SUPPORTS_INTO = hasattr(AESGCM, 'encrypt_into')
+
+
+# Clés dérivées récemment (LRU borné): la clé système d'un utilisateur a un sel
+# fixe et est redérivée à chaque sauvegarde, restauration ou téléchargement.
+DERIVED_KEY_CACHE_SIZE = 64
+_derived_key_cache: "OrderedDict[Tuple[bytes, bytes, int, int], bytes]" = OrderedDict()
+_derived_key_cache_lock = threading.Lock()
+
+
+def pbkdf2_sha256(password: bytes, salt: bytes, iterations: int, length: int = 32) -> bytes:
+    """Dérive une clé PBKDF2-HMAC-SHA256 avec l'implémentation la plus rapide disponible"""
+    # Le mot de passe n'est pas conservé en clair dans la clé du cache
+    cache_key = (hashlib.sha256(password).digest(), salt, iterations, length)
+    with _derived_key_cache_lock:
+        key = _derived_key_cache.get(cache_key)
+        if key is not None:
+            _derived_key_cache.move_to_end(cache_key)
+            return key
+    
+    if fast_pbkdf2_hmac is not None:
+        key = fast_pbkdf2_hmac('sha256', password, salt, iterations, length)
+    else:
+        # Pas de hashlib.pbkdf2_hmac: lié à l'OpenSSL du système (3.0 souvent), il est
+        # environ deux fois plus lent que l'OpenSSL embarqué par cryptography.
+        # Les deux précalculent les états ipad/opad de HMAC une seule fois.
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=length,
+            salt=salt,
+            iterations=iterations,
+        )
+        key = kdf.derive(password)
+    
+    with _derived_key_cache_lock:
+        _derived_key_cache[cache_key] = key
+        if len(_derived_key_cache) > DERIVED_KEY_CACHE_SIZE:
+            _derived_key_cache.popitem(last=False)
+    return key
+
+
+# Bit AES-NI dans le premier mot de OPENSSL_ia32cap (CPUID.1:ECX bit 25)
+OPENSSL_IA32CAP_AESNI_BIT = 1 << 57
+
+
+def detect_aes_acceleration() -> Tuple[str, Optional[bool], Optional[str]]:
+    """
+    Détecte si AES peut être accéléré matériellement (AES-NI, extensions ARMv8)
+    
+    Returns:
+        (version OpenSSL, instructions AES présentes sur le CPU ou None si inconnu,
+         valeur de OPENSSL_ia32cap si elle désactive AES-NI)
+    """
+    from cryptography.hazmat.backends.openssl.backend import backend
+    openssl_version = backend.openssl_version_text()
+    
+    cpu_has_aes = None
+    if platform.system() == 'Linux':
+        try:
+            with open('/proc/cpuinfo', 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    # "flags" sur x86, "Features" sur ARM
+                    if line.startswith(('flags', 'Features')):
+                        cpu_has_aes = 'aes' in line.split(':', 1)[-1].split()
+                        break
+        except OSError:
+            pass
+    
+    # OPENSSL_ia32cap="~0x200000000000000" masque AES-NI dans OpenSSL
+    disabling_cap = None
+    ia32cap = os.environ.get('OPENSSL_ia32cap')
+    if ia32cap and ia32cap.startswith('~'):
+        try:
+            if int(ia32cap[1:].split(':', 1)[0], 0) & OPENSSL_IA32CAP_AESNI_BIT:
+                disabling_cap = ia32cap
+        except ValueError:
+            pass
+    
+    return openssl_version, cpu_has_aes, disabling_cap
 
 
 class EncryptionService(BaseService):
@@ -19,13 +131,69 @@ class EncryptionService(BaseService):
     
     # Constantes de sécurité
     SALT_SIZE = 32
-    KEY_ITERATIONS = 100000
-    CHUNK_SIZE = 64 * 1024  # 64KB pour traitement par chunks
+    KEY_ITERATIONS = 600000  # Fichiers chiffrés par mot de passe (nombre inscrit dans l'en-tête)
+    LEGACY_KEY_ITERATIONS = 100000  # Ancien format Fernet (nombre d'itérations absent de l'en-tête)
+    SYSTEM_KEY_ITERATIONS = 100000  # Clé système non stockée: ne pas modifier (sauvegardes existantes)
+    MAX_KEY_ITERATIONS = 10_000_000  # Borne de la valeur lue dans un en-tête
+    IO_BUFFER_SIZE = 1024 * 1024  # Tampon des fichiers: regroupe les petites lectures/écritures
+    
+    # Format AES-256-GCM par blocs (sauvegardes chiffrées avec une clé système):
+    # MAGIC | préfixe de nonce (8 octets) | bloc chiffré + tag | bloc chiffré + tag...
+    # Tous les blocs font GCM_CHUNK_SIZE + GCM_TAG_SIZE octets sauf le dernier.
+    # Le nonce de chaque bloc est préfixe + index; le dernier bloc est marqué
+    # dans les données associées pour détecter toute troncature.
+    GCM_MAGIC = b'CPMGCM02'
+    # Même format par blocs pour le chiffrement par mot de passe, précédé du nombre
+    # d'itérations PBKDF2 et du sel:
+    # MAGIC_PASSWORD | itérations (4 octets) | sel (32 octets) | préfixe de nonce | blocs...
+    GCM_PASSWORD_MAGIC = b'CPMGCMP3'
+    # Variante compressée: contenu zstd chiffré (compresser avant de chiffrer,
+    # le texte chiffré étant incompressible)
+    GCM_PASSWORD_ZSTD_MAGIC = b'CPMGCMZ3'
+    # Formats par mot de passe: magic -> contenu compressé en zstd
+    GCM_PASSWORD_FORMATS = {
+        GCM_PASSWORD_MAGIC: False,
+        GCM_PASSWORD_ZSTD_MAGIC: True,
+    }
+    GCM_NONCE_PREFIX_SIZE = 8
+    GCM_TAG_SIZE = 16
+    GCM_CHUNK_SIZE = 1024 * 1024  # 1MB par bloc (fixé par le format: ne pas modifier)
+    GCM_AAD_CHUNK = b'\x00'
+    GCM_AAD_LAST_CHUNK = b'\x01'
+    
+    # Chiffrement des blocs sur plusieurs threads (AESGCM libère le GIL) pour les gros fichiers
+    ENCRYPT_WORKERS = min(4, os.cpu_count() or 1)
+    PARALLEL_MIN_BLOCKS = 64  # 64MB: en dessous, le coût des threads dépasse le gain
+    WRITE_BEHIND_DEPTH = 4  # Blocs en attente d'écriture par le thread d'écriture
+    # Tampons de lecture réutilisés: bloc traité, bloc lu d'avance, lecture en cours
+    READ_AHEAD_BUFFERS = 3
+    
+    ZSTD_LEVEL = 3  # Compromis vitesse/taille pour des dumps SQL et JSON
+    
+    _aes_acceleration_checked = False  # Vérification AES-NI faite une seule fois par processus
     
     def __init__(self):
         super().__init__('EncryptionService')
+        if not EncryptionService._aes_acceleration_checked:
+            EncryptionService._aes_acceleration_checked = True
+            self._check_aes_acceleration()
+    
+    def _check_aes_acceleration(self) -> None:
+        """Journalise le backend OpenSSL et avertit si AES n'est pas accéléré matériellement"""
+        try:
+            openssl_version, cpu_has_aes, disabling_cap = detect_aes_acceleration()
+        except Exception as e:
+            self.log_warning(f"⚠️ Impossible de vérifier l'accélération AES: {e}")
+            return
+        
+        self.log_info(f"🔧 Backend de chiffrement: {openssl_version}")
+        if cpu_has_aes is False:
+            self.log_warning("⚠️ Instructions AES absentes du CPU: chiffrement AES-GCM logiciel (lent)")
+        if disabling_cap:
+            self.log_warning(f"⚠️ AES-NI désactivé par OPENSSL_ia32cap={disabling_cap}")
     
-    def encrypt_file(self, source_path: Path, dest_path: Path, password: Optional[str] = None) -> None:
+    def encrypt_file(self, source_path: Path, dest_path: Path, password: Optional[str] = None,
+                     compress: Optional[bool] = None) -> None:
         """
         Chiffre un fichier avec AES-256
         
@@ -33,34 +201,36 @@ class EncryptionService(BaseService):
             source_path: Fichier source à chiffrer
             dest_path: Fichier de destination chiffré
             password: Mot de passe (utilise la clé par défaut si None)
+            compress: Compresse en zstd avant chiffrement (par défaut si zstandard est installé)
         """
-        self.log_info(f"🔐 Chiffrement de {source_path.name}")
+        self.log_info("🔐 Chiffrement de %s", source_path.name)
         
         try:
             # Génération du sel et de la clé
             salt = os.urandom(self.SALT_SIZE)
-            key = self._derive_key(password or self._get_default_password(), salt)
+            key = self._derive_raw_key(password or self._default_password_bytes, salt, self.KEY_ITERATIONS)
+            key_header = self.KEY_ITERATIONS.to_bytes(4, 'big') + salt
             
-            # Initialisation du chiffreur
-            fernet = Fernet(key)
+            # AES-256-GCM par blocs (voir encrypt_stream_with_key), itérations et sel dans l'en-tête
+            if compress is None:
+                compress = zstandard is not None
+            elif compress and zstandard is None:
+                raise RuntimeError("Compression zstd demandée mais le module zstandard n'est pas installé")
             
-            # Lecture et chiffrement par chunks pour les gros fichiers
-            with open(source_path, 'rb') as source_file, open(dest_path, 'wb') as dest_file:
-                # Écrire le sel en premier
-                dest_file.write(salt)
-                
-                # Chiffrement par chunks
-                while True:
-                    chunk = source_file.read(self.CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    
-                    encrypted_chunk = fernet.encrypt(chunk)
-                    # Écrire la taille du chunk puis le chunk chiffré
-                    dest_file.write(len(encrypted_chunk).to_bytes(4, 'big'))
-                    dest_file.write(encrypted_chunk)
+            with open(source_path, 'rb', buffering=self.IO_BUFFER_SIZE) as source_file, \
+                    open(dest_path, 'wb', buffering=self.IO_BUFFER_SIZE) as dest_file:
+                if compress:
+                    dest_file.write(self.GCM_PASSWORD_ZSTD_MAGIC + key_header)
+                    compressor = zstandard.ZstdCompressor(level=self.ZSTD_LEVEL, threads=-1)
+                    # BufferedReader: lectures complètes de GCM_CHUNK_SIZE (blocs de taille fixe)
+                    with io.BufferedReader(compressor.stream_reader(source_file, closefd=False),
+                                           self.IO_BUFFER_SIZE) as compressed_file:
+                        self._encrypt_gcm_stream(compressed_file, dest_file.write, key)
+                else:
+                    dest_file.write(self.GCM_PASSWORD_MAGIC + key_header)
+                    self._encrypt_gcm_stream(source_file, dest_file.write, key)
             
-            self.log_info(f"✅ Fichier chiffré: {dest_path}")
+            self.log_info("✅ Fichier chiffré: %s", dest_path)
             
         except Exception as e:
             self.log_error("❌ Erreur lors du chiffrement", e)
@@ -75,55 +245,89 @@ class EncryptionService(BaseService):
             dest_path: Fichier de destination déchiffré
             password: Mot de passe (utilise la clé par défaut si None)
         """
-        self.log_info(f"🔓 Déchiffrement de {source_path.name}")
+        self.log_info("🔓 Déchiffrement de %s", source_path.name)
         
         try:
-            with open(source_path, 'rb') as source_file, open(dest_path, 'wb') as dest_file:
-                # Extraction du sel
-                salt = source_file.read(self.SALT_SIZE)
-                
-                # Dérivation de la clé
-                key = self._derive_key(password or self._get_default_password(), salt)
-                fernet = Fernet(key)
-                
-                # Déchiffrement par chunks
-                while True:
-                    # Lire la taille du chunk
-                    size_bytes = source_file.read(4)
-                    if len(size_bytes) < 4:
-                        break
-                    
-                    chunk_size = int.from_bytes(size_bytes, 'big')
-                    encrypted_chunk = source_file.read(chunk_size)
-                    
-                    if not encrypted_chunk:
-                        break
-                    
-                    decrypted_chunk = fernet.decrypt(encrypted_chunk)
-                    dest_file.write(decrypted_chunk)
+            password = password or self._default_password_bytes
+            with open(source_path, 'rb', buffering=self.IO_BUFFER_SIZE) as source_file, \
+                    open(dest_path, 'wb', buffering=self.IO_BUFFER_SIZE) as dest_file:
+                header = self._read_password_header(source_file)
+                if header is None:
+                    # Ancien format: sel puis chunks Fernet
+                    salt = self._read_salt(source_file)
+                    self._decrypt_fernet_stream(source_file, dest_file, self._derive_key(password, salt))
+                else:
+                    salt, iterations, compressed = header
+                    key = self._derive_raw_key(password, salt, iterations)
+                    if compressed:
+                        if zstandard is None:
+                            raise RuntimeError("Fichier compressé en zstd: le module zstandard est requis")
+                        decompressor = zstandard.ZstdDecompressor()
+                        with decompressor.stream_writer(dest_file, closefd=False) as decompressed_file:
+                            self._decrypt_gcm_stream(source_file, decompressed_file, key)
+                    else:
+                        self._decrypt_gcm_stream(source_file, dest_file, key)
             
-            self.log_info(f"✅ Fichier déchiffré: {dest_path}")
+            self.log_info("✅ Fichier déchiffré: %s", dest_path)
             
         except Exception as e:
             self.log_error("❌ Erreur lors du déchiffrement", e)
             raise
     
-    def _derive_key(self, password: str, salt: bytes) -> bytes:
-        """Dérive une clé de chiffrement à partir du mot de passe"""
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=self.KEY_ITERATIONS,
-        )
-        key = kdf.derive(password.encode('utf-8'))
-        # Encode la clé en base64 pour Fernet
-        return base64.urlsafe_b64encode(key)
+    def _derive_key(self, password: Union[str, bytes], salt: bytes) -> bytes:
+        """Dérive une clé Fernet (base64) à partir du mot de passe (ancien format)"""
+        return base64.urlsafe_b64encode(self._derive_raw_key(password, salt, self.LEGACY_KEY_ITERATIONS))
+    
+    def _derive_raw_key(self, password: Union[str, bytes], salt: bytes, iterations: int) -> bytes:
+        """Dérive une clé AES-256 (32 octets) à partir du mot de passe (str ou UTF-8)"""
+        if isinstance(password, str):
+            password = password.encode('utf-8')
+        return pbkdf2_sha256(password, salt, iterations)
+    
+    def _read_password_header(self, source_file) -> Optional[Tuple[bytes, int, bool]]:
+        """
+        Lit l'en-tête d'un fichier chiffré par mot de passe au format AES-GCM
+        
+        Returns:
+            (sel, itérations PBKDF2, contenu zstd), ou None pour
+            l'ancien format Fernet (le flux est alors replacé au début)
+        """
+        magic = source_file.read(len(self.GCM_PASSWORD_MAGIC))
+        compressed = self.GCM_PASSWORD_FORMATS.get(magic)
+        if compressed is None:
+            source_file.seek(0)
+            return None
+        
+        iterations_bytes = source_file.read(4)
+        if len(iterations_bytes) != 4:
+            raise ValueError("Fichier chiffré tronqué (en-tête incomplet)")
+        iterations = int.from_bytes(iterations_bytes, 'big')
+        if not 1 <= iterations <= self.MAX_KEY_ITERATIONS:
+            raise ValueError(f"Nombre d'itérations invalide dans l'en-tête: {iterations}")
+        
+        return self._read_salt(source_file), iterations, compressed
+    
+    def _read_salt(self, source_file) -> bytes:
+        """Lit le sel de l'en-tête d'un fichier chiffré par mot de passe"""
+        salt = source_file.read(self.SALT_SIZE)
+        if len(salt) != self.SALT_SIZE:
+            raise ValueError("Fichier chiffré tronqué (sel incomplet)")
+        return salt
     
     def _get_default_password(self) -> str:
         """Obtient le mot de passe par défaut depuis les settings"""
+        return self._default_password
+    
+    @cached_property
+    def _default_password(self) -> str:
+        """Mot de passe par défaut, lu une seule fois (settings figés à l'exécution)"""
         return getattr(settings, 'BACKUP_ENCRYPTION_KEY', 'default-backup-key-change-me')
     
+    @cached_property
+    def _default_password_bytes(self) -> bytes:
+        """Mot de passe par défaut encodé en UTF-8 pour la dérivation de clé"""
+        return self._default_password.encode('utf-8')
+    
     def generate_user_based_key(self, user, additional_password: Optional[str] = None) -> str:
         """
         Génère une clé de chiffrement basée sur l'utilisateur
@@ -142,23 +346,40 @@ class EncryptionService(BaseService):
         if additional_password:
             base_string += f":{additional_password}"
             
-        # Générer une clé robuste
-        return hashlib.sha256(base_string.encode('utf-8')).hexdigest()
+        # BLAKE2b à clé (SECRET_KEY): hachage et authentification en une seule passe
+        return hashlib.blake2b(
+            base_string.encode('utf-8'),
+            digest_size=32,
+            key=settings.SECRET_KEY.encode('utf-8')[:64]
+        ).hexdigest()
     
     def hash_password(self, password: str) -> str:
-        """Hash un mot de passe pour stockage sécurisé"""
-        return hashlib.sha256(password.encode('utf-8')).hexdigest()
+        """
+        Hash un mot de passe pour stockage sécurisé
+        
+        Utilise les hashers Django (PBKDF2 salé par défaut): le résultat porte
+        son algorithme en préfixe ("algorithme$..."), ce qui permet de migrer.
+        """
+        return make_password(password)
     
     def verify_password(self, password: str, password_hash: str) -> bool:
-        """Vérifie un mot de passe contre son hash"""
-        return self.hash_password(password) == password_hash
+        """Vérifie un mot de passe contre son hash (ancien format SHA-256 hexadécimal accepté)"""
+        if '$' not in password_hash:
+            # Ancien format: SHA-256 non salé, sans préfixe d'algorithme.
+            # Comparaison en temps constant (check_password l'est déjà)
+            # (en bytes: compare_digest refuse les str non ASCII)
+            return hmac.compare_digest(
+                hashlib.sha256(password.encode('utf-8')).hexdigest().encode('ascii'),
+                password_hash.encode('utf-8')
+            )
+        return check_password(password, password_hash)
     
     @staticmethod
     def generate_key_from_password(password: str) -> str:
         """Génère une clé de chiffrement forte à partir d'un mot de passe"""
         return hashlib.sha256(password.encode('utf-8')).hexdigest()
     
-    def verify_encrypted_file(self, file_path: Path, password: Optional[str] = None) -> bool:
+    def verify_encrypted_file(self, file_path: Path, password: Optional[Union[str, bytes]] = None) -> bool:
         """
         Vérifie si un fichier chiffré peut être déchiffré
         
@@ -170,18 +391,35 @@ class EncryptionService(BaseService):
             True si le fichier peut être déchiffré
         """
         try:
+            password = password or self._default_password_bytes
             with open(file_path, 'rb') as f:
+                header = self._read_password_header(f)
+                if header is not None:
+                    # Test sur le premier bloc: le tag GCM couvre le bloc entier
+                    salt, iterations, _ = header
+                    nonce_prefix = f.read(self.GCM_NONCE_PREFIX_SIZE)
+                    encrypted_chunk = self._read_gcm_frame(f)
+                    if encrypted_chunk is None:
+                        return False
+                    aad = self.GCM_AAD_CHUNK if f.read(1) else self.GCM_AAD_LAST_CHUNK
+                    AESGCM(self._derive_raw_key(password, salt, iterations)).decrypt(
+                        self._gcm_nonce(nonce_prefix, 0), encrypted_chunk, aad
+                    )
+                    return True
+                
+                # Ancien format Fernet
                 salt = f.read(self.SALT_SIZE)
                 # Lire seulement la taille du premier chunk pour le test
                 size_bytes = f.read(4)
                 if len(size_bytes) < 4:
                     return False
                 
+                # Jeton Fernet complet: son HMAC couvre tout le chunk
                 chunk_size = int.from_bytes(size_bytes, 'big')
-                encrypted_data = f.read(min(chunk_size, 1024))  # Test sur maximum 1KB
+                encrypted_data = f.read(chunk_size)
             
-            key = self._derive_key(password or self._get_default_password(), salt)
-            fernet = Fernet(key)
+            key = self._derive_key(password, salt)
+            fernet = Fernet(key.decode('ascii'))
             fernet.decrypt(encrypted_data)
             
             return True
@@ -189,6 +427,26 @@ class EncryptionService(BaseService):
         except Exception:
             return False
     
+    def verify_many(self, file_paths: Iterable[Path], password: Optional[str] = None) -> Dict[Path, bool]:
+        """
+        Vérifie plusieurs fichiers chiffrés avec le même mot de passe
+        
+        Chaque fichier a son propre sel, donc sa propre dérivation PBKDF2: le mot de
+        passe n'est résolu et encodé qu'une fois, et les dérivations (qui libèrent
+        le GIL) s'exécutent sur plusieurs threads.
+        
+        Returns:
+            Résultat de verify_encrypted_file pour chaque chemin
+        """
+        password_bytes = password.encode('utf-8') if password else self._default_password_bytes
+        file_paths = list(file_paths)
+        if self.ENCRYPT_WORKERS <= 1 or len(file_paths) <= 1:
+            return {path: self.verify_encrypted_file(path, password_bytes) for path in file_paths}
+        
+        with ThreadPoolExecutor(max_workers=self.ENCRYPT_WORKERS, thread_name_prefix='crypto-verify') as executor:
+            results = executor.map(lambda path: self.verify_encrypted_file(path, password_bytes), file_paths)
+            return dict(zip(file_paths, results))
+    
     def generate_system_key(self, user) -> bytes:
         """
         Génère une clé de chiffrement système transparente
@@ -201,53 +459,284 @@ class EncryptionService(BaseService):
         user_salt = f"backup_salt_user_{user.id}".encode()
         
         # Dérivation de clé sécurisée avec PBKDF2
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=user_salt,
-            iterations=self.KEY_ITERATIONS,
-        )
-        return kdf.derive(key_material)
+        return pbkdf2_sha256(key_material, user_salt, self.SYSTEM_KEY_ITERATIONS)
     
-    def encrypt_file_with_key(self, source_path: Path, dest_path: Path, key: bytes) -> None:
+    # Erreurs signalant qu'une copie noyau n'est pas prise en charge (passage au mécanisme suivant)
+    KERNEL_COPY_UNSUPPORTED = frozenset({
+        errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF
+    })
+    
+    def copy_file(self, source_path: Path, dest_path: Path) -> int:
+        """
+        Copie un fichier sans chiffrement, entièrement dans le noyau si possible
+        
+        copy_file_range (copie côté système de fichiers), puis sendfile, puis
+        repli sur une copie par blocs en espace utilisateur.
+        
+        Returns:
+            Nombre d'octets copiés
         """
-        Chiffre un fichier avec AES-256 en utilisant une clé bytes directement
+        with open(source_path, 'rb', buffering=0) as source_file, \
+                open(dest_path, 'wb', buffering=0) as dest_file:
+            size = os.fstat(source_file.fileno()).st_size
+            copied = self._copy_in_kernel(source_file.fileno(), dest_file.fileno(), size)
+            if copied < size:
+                # Reprise là où la copie noyau s'est arrêtée
+                source_file.seek(copied)
+                shutil.copyfileobj(source_file, dest_file, self.IO_BUFFER_SIZE)
+            total_size = dest_file.tell()
+        
+        self.log_info("📋 Fichier copié sans chiffrement: %s (%s)", dest_path, self.format_size(total_size))
+        return total_size
+    
+    def _copy_in_kernel(self, source_fd: int, dest_fd: int, size: int) -> int:
+        """Copie jusqu'à size octets entre descripteurs sans passer par l'espace utilisateur"""
+        copied = 0
+        # La position du descripteur destination avance, celle de la source est explicite
+        copy_functions = []
+        if hasattr(os, 'copy_file_range'):
+            copy_functions.append(lambda count: os.copy_file_range(source_fd, dest_fd, count, copied))
+        if hasattr(os, 'sendfile'):
+            copy_functions.append(lambda count: os.sendfile(dest_fd, source_fd, copied, count))
+        
+        for copy_chunk in copy_functions:
+            try:
+                while copied < size:
+                    sent = copy_chunk(min(size - copied, 1 << 30))
+                    if sent == 0:  # Fichier source raccourci pendant la copie
+                        return copied
+                    copied += sent
+                return copied
+            except OSError as e:
+                if e.errno not in self.KERNEL_COPY_UNSUPPORTED:
+                    raise
+        return copied
+    
+    def encrypt_file_with_key(self, source_path: Path, dest_path: Path, key: bytes) -> Tuple[int, str]:
+        """
+        Chiffre un fichier avec AES-256-GCM en utilisant une clé bytes directement
         
         Args:
             source_path: Fichier source à chiffrer
             dest_path: Fichier de destination chiffré
             key: Clé de chiffrement (bytes, 32 octets pour AES-256)
+            
+        Returns:
+            Taille et checksum SHA-256 du fichier chiffré, calculés pendant l'écriture
         """
-        self.log_info(f"🔐 Chiffrement de {source_path.name}")
+        self.log_info("🔐 Chiffrement de %s", source_path.name)
         
+        with open(source_path, 'rb', buffering=self.IO_BUFFER_SIZE) as source_file:
+            return self.encrypt_stream_with_key(source_file, dest_path, key)
+    
+    def encrypt_stream_with_key(self, source_file: BinaryIO, dest_path: Path, key: bytes) -> Tuple[int, str]:
+        """
+        Chiffre le contenu d'un fichier déjà ouvert (lu depuis sa position courante)
+        
+        Args:
+            source_file: Flux binaire source à chiffrer
+            dest_path: Fichier de destination chiffré
+            key: Clé de chiffrement (bytes, 32 octets pour AES-256)
+            
+        Returns:
+            Taille et checksum SHA-256 du fichier chiffré, calculés pendant l'écriture
+        """
         try:
             # Vérification de la longueur de la clé
             if len(key) != 32:
                 raise ValueError(f"La clé doit faire exactement 32 octets, reçu {len(key)}")
             
-            # Encodage de la clé pour Fernet
-            fernet_key = base64.urlsafe_b64encode(key)
-            fernet = Fernet(fernet_key)
+            # Checksum et taille du fichier chiffré calculés au fil de l'écriture
+            checksum = hashlib.sha256()
+            total_size = 0
             
-            # Chiffrement par chunks pour optimiser la mémoire
-            with open(source_path, 'rb') as source_file, open(dest_path, 'wb') as dest_file:
-                # Chiffrement par chunks (pas de sel nécessaire)
-                while True:
-                    chunk = source_file.read(self.CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    
-                    encrypted_chunk = fernet.encrypt(chunk)
-                    # Écrire la taille du chunk puis le chunk chiffré
-                    dest_file.write(len(encrypted_chunk).to_bytes(4, 'big'))
-                    dest_file.write(encrypted_chunk)
+            def write(data: bytes) -> None:
+                nonlocal total_size
+                dest_file.write(data)
+                checksum.update(data)
+                total_size += len(data)
             
-            self.log_info(f"✅ Fichier chiffré: {dest_path}")
+            with open(dest_path, 'wb', buffering=self.IO_BUFFER_SIZE) as dest_file:
+                write(self.GCM_MAGIC)
+                self._encrypt_gcm_stream(source_file, write, key)
+            
+            self.log_info("✅ Fichier chiffré: %s", dest_path)
+            return total_size, checksum.hexdigest()
             
         except Exception as e:
             self.log_error("❌ Erreur lors du chiffrement", e)
             raise
     
+    def _encrypt_gcm_stream(self, source_file: BinaryIO, write: Callable[[bytes], Any], key: bytes) -> None:
+        """Écrit le préfixe de nonce puis les blocs AES-256-GCM du flux source (après l'en-tête)"""
+        aesgcm = AESGCM(key)
+        nonce_prefix = os.urandom(self.GCM_NONCE_PREFIX_SIZE)
+        write(nonce_prefix)
+        
+        # Écritures dans un thread dédié pendant le chiffrement des blocs suivants
+        with self._write_behind(write) as write_block:
+            source_map = self._map_source(source_file)
+            if source_map is not None:
+                # Fichier projeté en mémoire: les blocs sont des vues, sans copie par read()
+                with source_map, memoryview(source_map) as view:
+                    self._encrypt_gcm_view(aesgcm, nonce_prefix, view[source_file.tell():], write_block)
+                return
+            
+            # Lectures anticipées dans un thread dédié (le dernier bloc est connu à l'avance)
+            encrypt = self._gcm_encrypter(aesgcm)
+            with closing(self._read_ahead(self._ring_reader(source_file, self.GCM_CHUNK_SIZE))) as blocks:
+                for index, (chunk, is_last) in enumerate(blocks):
+                    aad = self.GCM_AAD_LAST_CHUNK if is_last else self.GCM_AAD_CHUNK
+                    # Taille fixe (sauf dernier bloc): une seule écriture, sans préfixe de taille
+                    write_block(encrypt(self._gcm_nonce(nonce_prefix, index), chunk, aad))
+    
+    def _gcm_encrypter(self, aesgcm: AESGCM) -> Callable[[bytes, Any, bytes], Any]:
+        """
+        Fonction de chiffrement d'un bloc, écrit dans des tampons réutilisés si possible
+        
+        Un tampon n'est réutilisé qu'après WRITE_BEHIND_DEPTH + 1 blocs: le bloc
+        retourné doit être passé à l'écriture de _write_behind.
+        """
+        if not AESGCM_SUPPORTS_INTO:
+            return aesgcm.encrypt
+        
+        take_buffer = self._output_ring(self.GCM_CHUNK_SIZE + self.GCM_TAG_SIZE)
+        
+        def encrypt(nonce: bytes, data: Any, aad: bytes) -> Any:
+            if len(data) > self.GCM_CHUNK_SIZE:
+                return aesgcm.encrypt(nonce, data, aad)
+            buffer = take_buffer(len(data) + self.GCM_TAG_SIZE)
+            aesgcm.encrypt_into(nonce, data, aad, buffer)
+            return buffer
+        
+        return encrypt
+    
+    def _gcm_decrypter(self, aesgcm: AESGCM) -> Callable[[bytes, Any, bytes], Any]:
+        """Fonction de déchiffrement d'un bloc, mêmes tampons réutilisés que _gcm_encrypter"""
+        if not AESGCM_SUPPORTS_INTO:
+            return aesgcm.decrypt
+        
+        take_buffer = self._output_ring(self.GCM_CHUNK_SIZE)
+        
+        def decrypt(nonce: bytes, data: Any, aad: bytes) -> Any:
+            # Blocs trop courts (InvalidTag) ou plus grands qu'un tampon: chemin standard
+            if not self.GCM_TAG_SIZE <= len(data) <= self.GCM_CHUNK_SIZE + self.GCM_TAG_SIZE:
+                return aesgcm.decrypt(nonce, data, aad)
+            buffer = take_buffer(len(data) - self.GCM_TAG_SIZE)
+            aesgcm.decrypt_into(nonce, data, aad, buffer)
+            return buffer
+        
+        return decrypt
+    
+    def _output_ring(self, size: int) -> Callable[[int], memoryview]:
+        """Anneau de WRITE_BEHIND_DEPTH + 1 tampons de sortie; retourne une vue de la longueur demandée"""
+        views = [memoryview(bytearray(size)) for _ in range(self.WRITE_BEHIND_DEPTH + 1)]
+        positions = itertools.cycle(views)
+        return lambda length: next(positions)[:length]
+    
+    def _ring_reader(self, source_file: BinaryIO, size: int) -> Callable[[], Union[bytes, memoryview]]:
+        """
+        Fonction de lecture par readinto dans un anneau de tampons préalloués
+        
+        Évite d'allouer un objet bytes par bloc. Une vue retournée est réécrite
+        READ_AHEAD_BUFFERS lectures plus tard: elle doit être consommée avant
+        (c'est le cas avec _read_ahead, qui a au plus deux blocs d'avance).
+        """
+        readinto = getattr(source_file, 'readinto', None)
+        if readinto is None:
+            return lambda: source_file.read(size)
+        
+        views = [memoryview(bytearray(size)) for _ in range(self.READ_AHEAD_BUFFERS)]
+        positions = itertools.cycle(views)
+        
+        def read() -> memoryview:
+            view = next(positions)
+            return view[:readinto(view) or 0]
+        
+        return read
+    
+    @staticmethod
+    def _read_ahead(read: Callable[[], Optional[bytes]]) -> Iterator[Tuple[Optional[bytes], bool]]:
+        """
+        Lit les blocs dans un thread dédié, avec deux blocs d'avance sur le traitement
+        
+        Produit des couples (bloc, dernier bloc). Le premier bloc est toujours
+        produit, même vide ou None (fichier vide), la lecture s'arrête ensuite
+        au premier bloc vide.
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='crypto-read') as reader:
+            chunk = read()
+            next_read = reader.submit(read)
+            while True:
+                next_chunk = next_read.result()
+                if next_chunk:
+                    next_read = reader.submit(read)
+                yield chunk, not next_chunk
+                if not next_chunk:
+                    return
+                chunk = next_chunk
+    
+    @contextmanager
+    def _write_behind(self, write: Callable[[bytes], Any]) -> Iterator[Callable[[bytes], None]]:
+        """
+        Fournit une fonction d'écriture déléguée à un thread dédié (ordre conservé)
+        
+        Au plus WRITE_BEHIND_DEPTH blocs restent en attente; les erreurs d'écriture
+        sont propagées au plus tard à la sortie du bloc with.
+        """
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='crypto-write') as writer:
+            def write_block(data: bytes) -> None:
+                pending.append(writer.submit(write, data))
+                if len(pending) > self.WRITE_BEHIND_DEPTH:
+                    pending.popleft().result()
+            
+            yield write_block
+            
+            while pending:
+                pending.popleft().result()
+    
+    @staticmethod
+    def _map_source(source_file: BinaryIO) -> Optional[mmap.mmap]:
+        """Projette un fichier source en lecture seule (None si flux non projetable ou vide)"""
+        try:
+            source_file.flush()
+            fileno = source_file.fileno()
+            if os.fstat(fileno).st_size <= source_file.tell():
+                return None
+            return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            return None
+    
+    def _encrypt_gcm_view(self, aesgcm: AESGCM, nonce_prefix: bytes, data: memoryview,
+                          write: Callable[[bytes], Any]) -> None:
+        """Chiffre en blocs AES-256-GCM des tranches d'une vue mémoire (taille connue à l'avance)"""
+        block_size = self.GCM_CHUNK_SIZE
+        block_count = max(1, -(-len(data) // block_size))
+        
+        def encrypt_block(index: int, encrypt: Callable[..., Any] = aesgcm.encrypt) -> bytes:
+            aad = self.GCM_AAD_LAST_CHUNK if index == block_count - 1 else self.GCM_AAD_CHUNK
+            start = index * block_size
+            return encrypt(self._gcm_nonce(nonce_prefix, index), data[start:start + block_size], aad)
+        
+        if self.ENCRYPT_WORKERS <= 1 or block_count < self.PARALLEL_MIN_BLOCKS:
+            encrypt = self._gcm_encrypter(aesgcm)
+            for index in range(block_count):
+                write(encrypt_block(index, encrypt))
+            return
+        
+        # Blocs indépendants (nonce = préfixe + index): chiffrés en parallèle, écrits dans l'ordre
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.ENCRYPT_WORKERS) as executor:
+            for index in range(block_count):
+                pending.append(executor.submit(encrypt_block, index))
+                # Fenêtre bornée pour limiter la mémoire occupée par les blocs chiffrés
+                if len(pending) >= self.ENCRYPT_WORKERS * 2:
+                    write(pending.popleft().result())
+            
+            while pending:
+                write(pending.popleft().result())
+    
     def decrypt_file_with_key(self, source_path: Path, dest_path: Path, key: bytes) -> None:
         """
         Déchiffre un fichier en utilisant une clé bytes directement
@@ -257,36 +746,80 @@ class EncryptionService(BaseService):
             dest_path: Fichier de destination déchiffré
             key: Clé de déchiffrement (bytes, 32 octets pour AES-256)
         """
-        self.log_info(f"🔓 Déchiffrement de {source_path.name}")
+        self.log_info("🔓 Déchiffrement de %s", source_path.name)
         
         try:
             # Vérification de la longueur de la clé
             if len(key) != 32:
                 raise ValueError(f"La clé doit faire exactement 32 octets, reçu {len(key)}")
             
-            with open(source_path, 'rb') as source_file, open(dest_path, 'wb') as dest_file:
-                # Encodage de la clé pour Fernet
-                fernet_key = base64.urlsafe_b64encode(key)
-                fernet = Fernet(fernet_key)
-                
-                # Déchiffrement par chunks (pas de sel à ignorer)
-                while True:
-                    # Lire la taille du chunk
-                    size_bytes = source_file.read(4)
-                    if len(size_bytes) < 4:
-                        break
-                    
-                    chunk_size = int.from_bytes(size_bytes, 'big')
-                    encrypted_chunk = source_file.read(chunk_size)
-                    
-                    if not encrypted_chunk:
-                        break
-                    
-                    decrypted_chunk = fernet.decrypt(encrypted_chunk)
-                    dest_file.write(decrypted_chunk)
+            with open(source_path, 'rb', buffering=self.IO_BUFFER_SIZE) as source_file, \
+                    open(dest_path, 'wb', buffering=self.IO_BUFFER_SIZE) as dest_file:
+                magic = source_file.read(len(self.GCM_MAGIC))
+                if magic == self.GCM_MAGIC:
+                    self._decrypt_gcm_stream(source_file, dest_file, key)
+                else:
+                    # Ancien format Fernet (sauvegardes antérieures à AES-GCM)
+                    source_file.seek(0)
+                    self._decrypt_fernet_stream(source_file, dest_file, base64.urlsafe_b64encode(key))
             
-            self.log_info(f"✅ Fichier déchiffré: {dest_path}")
+            self.log_info("✅ Fichier déchiffré: %s", dest_path)
             
         except Exception as e:
             self.log_error("❌ Erreur lors du déchiffrement", e)
-            raise 
\ No newline at end of file
+            raise
+    
+    def _decrypt_fernet_stream(self, source_file, dest_file, fernet_key: bytes) -> None:
+        """Déchiffre le contenu au format Fernet par chunks (ancien format, clé base64)"""
+        fernet = Fernet(fernet_key.decode('ascii'))
+        
+        # Déchiffrement par chunks (position après l'éventuel sel)
+        while True:
+            # Lire la taille du chunk
+            size_bytes = source_file.read(4)
+            if len(size_bytes) < 4:
+                break
+            
+            chunk_size = int.from_bytes(size_bytes, 'big')
+            encrypted_chunk = source_file.read(chunk_size)
+            
+            if not encrypted_chunk:
+                break
+            
+            decrypted_chunk = fernet.decrypt(encrypted_chunk)
+            dest_file.write(decrypted_chunk)
+    
+    def _decrypt_gcm_stream(self, source_file, dest_file, key: bytes) -> None:
+        """Déchiffre le contenu AES-256-GCM par blocs (après l'en-tête MAGIC)"""
+        aesgcm = AESGCM(key)
+        nonce_prefix = source_file.read(self.GCM_NONCE_PREFIX_SIZE)
+        if len(nonce_prefix) != self.GCM_NONCE_PREFIX_SIZE:
+            raise ValueError("Fichier chiffré tronqué (en-tête incomplet)")
+        
+        # Blocs de taille fixe: lus dans des tampons réutilisés
+        read_block = self._ring_reader(source_file, self.GCM_CHUNK_SIZE + self.GCM_TAG_SIZE)
+        decrypt = self._gcm_decrypter(aesgcm)
+        # Lecture, déchiffrement et écriture se recouvrent (threads de lecture et d'écriture)
+        with self._write_behind(dest_file.write) as write_block:
+            with closing(self._read_ahead(read_block)) as blocks:
+                for index, (encrypted_chunk, is_last) in enumerate(blocks):
+                    if not encrypted_chunk:
+                        raise ValueError("Fichier chiffré tronqué (aucun bloc)")
+                    aad = self.GCM_AAD_LAST_CHUNK if is_last else self.GCM_AAD_CHUNK
+                    
+                    # InvalidTag si le bloc est altéré, déplacé ou si le fichier est tronqué
+                    write_block(decrypt(self._gcm_nonce(nonce_prefix, index), encrypted_chunk, aad))
+    
+    def _read_gcm_frame(self, source_file) -> Optional[bytes]:
+        """
+        Lit un bloc chiffré de taille fixe (None en fin de fichier)
+        
+        Un bloc tronqué est plus court: son tag ne correspond plus et le
+        déchiffrement échoue (InvalidTag).
+        """
+        return source_file.read(self.GCM_CHUNK_SIZE + self.GCM_TAG_SIZE) or None
+    
+    @staticmethod
+    def _gcm_nonce(nonce_prefix: bytes, index: int) -> bytes:
+        """Nonce de 12 octets unique par bloc: préfixe aléatoire + index du bloc"""
+        return nonce_prefix + index.to_bytes(4, 'big')
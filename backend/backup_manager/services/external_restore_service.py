@@ -13,22 +13,160 @@ PROBLÈMES RÉSOLUS:
 PRINCIPE: Isolation totale via des tables dédiées
 """
 
+import io
 import os
+import errno
+import re
+import hashlib
 import tempfile
 import zipfile
 import shutil
 import sqlite3
 import json
-from pathlib import Path
-from typing import Dict, Any, Optional, List, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Dict, Any, Iterable, Iterator, Optional, List, Tuple
 from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction
 from ..models import UploadedBackup, ExternalRestoration
 from .base_service import BaseService
 from .encryption_service import EncryptionService
 
 
+# Instructions d'un dump SQL, reconnues en début de ligne en une seule recherche:
+# groupe 1 = nom de table pour CREATE TABLE, None pour INSERT INTO
+SQL_LINE_RE = re.compile(r'^\s*(?:INSERT INTO|CREATE TABLE ["`]?(\w+))', re.IGNORECASE)
+
+# Nom de table d'une instruction SQL, essayés dans l'ordre (insensibles à la casse:
+# aucune copie en minuscules des instructions, qui peuvent être très longues)
+TABLE_NAME_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'create\s+table\s+(?:if\s+not\s+exists\s+)?[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
+    r'insert\s+into\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
+    r'update\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
+    r'delete\s+from\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
+    r'drop\s+table\s+(?:if\s+exists\s+)?[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
+    r'alter\s+table\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
+))
+# Motif applicable selon le premier mot de l'instruction (même ordre que ci-dessus)
+TABLE_NAME_PATTERN_BY_VERB = dict(zip(
+    ('create', 'insert', 'update', 'delete', 'drop', 'alter'), TABLE_NAME_PATTERNS
+))
+
+# Délimiteurs d'identifiant SQL (ouvrant -> fermant) et caractères d'un identifiant nu
+IDENTIFIER_QUOTES = {'"': '"', '`': '`', '[': ']'}
+IDENTIFIER_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+
+# Type d'un statement exécuté (groupe 1 = CREATE TABLE, sinon INSERT, y compris
+# INSERT OR IGNORE/REPLACE produits par _resolve_id_conflicts), sans copie en majuscules
+APPLIED_STATEMENT_RE = re.compile(r'\s*(?:(CREATE\s+TABLE)|INSERT\s+(?:OR\s+\w+\s+)?INTO)', re.IGNORECASE)
+VALUES_KEYWORD_RE = re.compile(r'VALUES', re.IGNORECASE)
+
+# Instructions de définition (DDL), seules concernées par le dédoublonnage
+DDL_STATEMENT_RE = re.compile(r'\s*(?:CREATE|ALTER|DROP|COMMENT)\b', re.IGNORECASE)
+
+# Signatures ZIP possibles en début de fichier: entrée locale, archive vide, archive fractionnée
+ZIP_SIGNATURES = (b'PK\x03\x04', b'PK\x05\x06', b'PK\x07\x08')
+
+# Délimiteurs significatifs pour le découpage des instructions SQL hors chaînes/commentaires.
+# Une chaîne complète sur la ligne est sautée en une seule correspondance ('' = deux
+# chaînes accolées); une quote seule ouvre une chaîne qui continue à la ligne suivante.
+SQL_TOKEN_RE = re.compile(r"""'[^']*'|"[^"]*"|[;'"]|--|/\*""")
+
+# Longueur de tête d'instruction utilisée comme clé de cache (verbe + nom de table)
+STATEMENT_HEAD_LENGTH = 128
+
+# Préfixes des tables Django/Auth/backup protégées, testés en une seule correspondance
+PROTECTED_TABLE_PREFIX_RE = re.compile(r'^(?:auth_|authentication_|django_|backup_manager_)')
+
+
+def iter_sql_statements(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Découpe un dump SQL en instructions au fil de la lecture (sans le ';' final)
+    
+    Les ';' situés dans une chaîne ('...' ou "..."), un commentaire '--' ou
+    un commentaire /* ... */ ne terminent pas l'instruction. Seule
+    l'instruction en cours est conservée en mémoire.
+    """
+    parts = []
+    closing = None  # Délimiteur fermant attendu: quote ou '*/'
+    for line in lines:
+        start = pos = 0
+        while True:
+            if closing is not None:
+                end = line.find(closing, pos)
+                if end < 0:
+                    break
+                pos = end + len(closing)
+                closing = None
+                continue
+            
+            token = SQL_TOKEN_RE.search(line, pos)
+            if token is None:
+                break
+            
+            delimiter = token.group()
+            pos = token.end()
+            if delimiter == ';':
+                parts.append(line[start:token.start()])
+                yield ''.join(parts)
+                parts = []
+                start = pos
+            elif delimiter == '--':
+                # Commentaire jusqu'à la fin de ligne
+                break
+            elif delimiter == '/*':
+                closing = '*/'
+            elif len(delimiter) == 1:
+                # Chaîne ouverte sur plusieurs lignes
+                closing = delimiter
+            # Sinon: chaîne complète déjà sautée
+        parts.append(line[start:])
+    
+    remainder = ''.join(parts)
+    if remainder.strip():
+        yield remainder
+
+
+def _read_sql_identifier(statement: str, pos: int) -> Tuple[Optional[str], int]:
+    """
+    Lit un identifiant SQL nu ou délimité à partir de pos
+    
+    Dans un identifiant délimité, un délimiteur fermant doublé ("" ou ``) est
+    un caractère de l'identifiant. Retourne (identifiant, position suivante),
+    ou (None, pos) si aucun identifiant valide ne commence à pos.
+    """
+    length = len(statement)
+    if pos >= length:
+        return None, pos
+    
+    closing = IDENTIFIER_QUOTES.get(statement[pos])
+    if closing is not None:
+        parts = []
+        start = pos + 1
+        while True:
+            end = statement.find(closing, start)
+            if end < 0:
+                return None, pos
+            parts.append(statement[start:end])
+            if statement.startswith(closing, end + 1) and closing != ']':
+                # Délimiteur doublé: échappement
+                parts.append(closing)
+                start = end + 2
+                continue
+            name = ''.join(parts)
+            return (name, end + 1) if name else (None, pos)
+    
+    end = pos
+    while end < length and statement[end] in IDENTIFIER_CHARS:
+        end += 1
+    if end == pos or statement[pos].isdigit():
+        return None, pos
+    return statement[pos:end], end
+
+
 class ExternalRestoreService(BaseService):
     """
     Service spécialisé pour les restaurations externes avec isolation complète.
@@ -62,6 +200,16 @@ class ExternalRestoreService(BaseService):
         'auth_user_user_permissions',        # 🔧 Table de liaison
     ])
     
+    # Tables de données métier qui peuvent être écrasées avec INSERT OR REPLACE
+    REPLACEABLE_DATA_TABLES = frozenset([
+        'database_dynamictable',
+        'database_dynamicfield',
+        'database_dynamicrecord',
+        'database_dynamicvalue',
+        'conditional_fields_conditionalfieldrule',
+        'conditional_fields_conditionalfieldoption',
+    ])
+    
     # Répertoires de fichiers PROTÉGÉS (ne jamais écraser)
     PROTECTED_FILE_PATHS = frozenset([
         'backups/',
@@ -69,9 +217,18 @@ class ExternalRestoreService(BaseService):
         'media/system/',
     ])
     
+    SQL_READ_BUFFER_SIZE = 1024 * 1024  # 1MB pour la lecture des dumps SQL
+    STATEMENT_BATCH_SIZE = 500  # Statements par savepoint (rejoués un par un si le lot échoue)
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB par écriture/mise à jour du checksum (64KB par défaut dans Django)
+    UPLOAD_WRITE_BUFFER_SIZE = 4 * 1024 * 1024  # Tampon d'écriture: un write() système pour 4 chunks
+    EXTRACT_WORKERS = min(4, os.cpu_count() or 1)  # Threads de décompression (zlib libère le GIL)
+    PARALLEL_EXTRACT_MIN_SIZE = 16 * 1024 * 1024  # En dessous, extraction séquentielle
+    
     def __init__(self):
         super().__init__('ExternalRestoreService')
         self.encryption_service = EncryptionService()
+        # Checksums déjà calculés: chemin -> (mtime_ns, taille, checksum)
+        self._checksum_cache: Dict[str, Tuple[int, int, str]] = {}
     
     def handle_external_upload(self, uploaded_file, user, upload_name: str) -> UploadedBackup:
         """
@@ -84,6 +241,11 @@ class ExternalRestoreService(BaseService):
         """
         self.log_info(f"🔄 Début traitement upload externe: {upload_name}")
         
+        # Limite de taille (déjà appliquée à la réception quand le gestionnaire d'upload est installé)
+        max_bytes = getattr(settings, 'EXTERNAL_UPLOAD_MAX_BYTES', 500 * 1024 * 1024)
+        if uploaded_file.size > max_bytes:
+            raise ValueError(f"Fichier trop volumineux. Taille maximale: {max_bytes // (1024 * 1024)} MB")
+        
         # Créer le répertoire d'uploads isolé
         upload_dir = self._create_isolated_upload_directory()
         
@@ -93,16 +255,10 @@ class ExternalRestoreService(BaseService):
         upload_path = upload_dir / safe_filename
         
         try:
-            # Sauvegarder le fichier uploadé dans l'espace isolé
-            with open(upload_path, 'wb') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
+            # Toutes les E/S disque d'abord: la base n'est sollicitée qu'une fois le fichier en place
+            checksum, file_size = self._store_external_upload(uploaded_file, upload_path)
             
-            # Calculer les métadonnées
-            file_size = upload_path.stat().st_size
-            checksum = self._calculate_file_checksum(upload_path)
-            
-            # Créer l'enregistrement UploadedBackup (isolé)
+            # Créer l'enregistrement UploadedBackup (isolé), un seul INSERT
             uploaded_backup = UploadedBackup.objects.create(
                 original_filename=uploaded_file.name,
                 upload_name=upload_name,
@@ -116,7 +272,8 @@ class ExternalRestoreService(BaseService):
             self.log_info(f"✅ Upload externe enregistré: ID {uploaded_backup.id}")
             
             # Lancer la validation en arrière-plan
-            self._validate_external_backup(uploaded_backup)
+            # Checksum calculé à l'instant pendant l'écriture: pas de nouvelle vérification
+            self._validate_external_backup(uploaded_backup, verify_checksum=False)
             
             return uploaded_backup
             
@@ -127,6 +284,37 @@ class ExternalRestoreService(BaseService):
                 upload_path.unlink()
             raise
     
+    def _store_external_upload(self, uploaded_file, upload_path: Path) -> Tuple[str, int]:
+        """
+        Enregistre le fichier uploadé dans l'espace isolé, checksum calculé au fil de l'écriture
+        
+        Returns:
+            Tuple (checksum SHA-256, taille en octets), checksum mémorisé pour la validation
+        """
+        digest = hashlib.sha256()
+        if hasattr(uploaded_file, 'temporary_file_path'):
+            # Gros upload déjà sur disque: lecture pour le checksum puis déplacement
+            for chunk in uploaded_file.chunks(self.UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+            temporary_path = Path(uploaded_file.temporary_file_path())
+            try:
+                # Même système de fichiers: simple renommage, aucune recopie
+                os.replace(temporary_path, upload_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # Autre système de fichiers: copie dans le noyau (le fichier temporaire
+                # est supprimé par Django à la fermeture de l'upload)
+                self.encryption_service.copy_file(temporary_path, upload_path)
+        else:
+            with open(upload_path, 'wb', buffering=self.UPLOAD_WRITE_BUFFER_SIZE) as destination:
+                for chunk in uploaded_file.chunks(self.UPLOAD_CHUNK_SIZE):
+                    destination.write(chunk)
+                    digest.update(chunk)
+        
+        checksum = digest.hexdigest()
+        return checksum, self._remember_checksum(upload_path, checksum).st_size
+    
     def restore_from_external_backup(
         self, 
         uploaded_backup: UploadedBackup, 
@@ -176,8 +364,15 @@ class ExternalRestoreService(BaseService):
         
         return upload_dir
     
-    def _validate_external_backup(self, uploaded_backup: UploadedBackup) -> None:
-        """Valide un upload externe sans impact sur le système"""
+    def _validate_external_backup(self, uploaded_backup: UploadedBackup, verify_checksum: bool = True) -> None:
+        """
+        Valide un upload externe sans impact sur le système
+        
+        Args:
+            uploaded_backup: Upload à valider
+            verify_checksum: Relire le fichier pour contrôler son checksum (inutile juste
+                après l'upload, le checksum venant d'être calculé pendant l'écriture)
+        """
         self.log_info(f"🔍 Validation upload ID {uploaded_backup.id}")
         
         try:
@@ -188,26 +383,28 @@ class ExternalRestoreService(BaseService):
                 uploaded_backup.mark_as_failed("Fichier uploadé introuvable")
                 return
             
-            # Vérifier le checksum
-            calculated_checksum = self._calculate_file_checksum(upload_path)
-            if calculated_checksum != uploaded_backup.file_checksum:
-                uploaded_backup.mark_as_failed("Checksum invalide - fichier corrompu")
-                return
+            # Vérifier le checksum (revalidation d'un fichier déjà stocké)
+            if verify_checksum:
+                calculated_checksum = self._calculate_file_checksum(upload_path)
+                if calculated_checksum != uploaded_backup.file_checksum:
+                    uploaded_backup.mark_as_failed("Checksum invalide - fichier corrompu")
+                    return
             
             # Analyser le contenu (déchiffrement si nécessaire)
             metadata = self._analyze_backup_content(upload_path)
             
-            # Mettre à jour les métadonnées
+            # Mettre à jour les métadonnées (enregistrées avec le statut, en un seul UPDATE)
             uploaded_backup.backup_metadata = metadata
             uploaded_backup.detected_backup_type = metadata.get('backup_type', 'unknown')
             uploaded_backup.detected_source_system = metadata.get('source_system', 'unknown')
+            metadata_fields = ('backup_metadata', 'detected_backup_type', 'detected_source_system')
             
             # Marquer comme prêt si validé
             if metadata.get('is_valid', False):
-                uploaded_backup.mark_as_ready()
+                uploaded_backup.mark_as_ready(extra_fields=metadata_fields)
                 self.log_info(f"✅ Upload ID {uploaded_backup.id} validé et prêt")
             else:
-                uploaded_backup.mark_as_failed("Contenu invalide ou non reconnu")
+                uploaded_backup.mark_as_failed("Contenu invalide ou non reconnu", extra_fields=metadata_fields)
                 
         except Exception as e:
             uploaded_backup.mark_as_failed(f"Erreur validation: {str(e)}")
@@ -247,18 +444,13 @@ class ExternalRestoreService(BaseService):
                         # Essayer quand même d'analyser le fichier original
                         working_file = backup_path
                 
-                # Vérifier si c'est un fichier ZIP
+                # Vérifier si c'est un fichier ZIP (extension, sinon signature: fichiers sans extension)
                 if working_file.suffix in ['.zip'] or self._is_zip_file(working_file):
-                    self.log_info("📦 Fichier ZIP détecté, extraction...")
-                    extract_dir = temp_path / "extracted"
-                    extract_dir.mkdir()
+                    self.log_info("📦 Fichier ZIP détecté, analyse des entrées sans extraction...")
                     
                     try:
                         with zipfile.ZipFile(working_file, 'r') as zip_file:
-                            zip_file.extractall(extract_dir)
-                            self.log_info(f"✅ Extraction réussie - {len(zip_file.namelist())} fichiers")
-                        
-                        metadata.update(self._analyze_extracted_backup(extract_dir))
+                            metadata.update(self._analyze_zip_backup(zip_file))
                         
                     except zipfile.BadZipFile:
                         self.log_warning("❌ Fichier ZIP corrompu ou invalide")
@@ -280,19 +472,6 @@ class ExternalRestoreService(BaseService):
                     # Fichier non reconnu
                     self.log_warning(f"⚠️ Type de fichier non reconnu: {working_file.suffix}")
                     metadata['analysis_warnings'].append(f"Type de fichier non reconnu: {working_file.suffix}")
-                    
-                    # Essayer quand même de le traiter comme un ZIP (fichiers sans extension)
-                    if self._is_zip_file(working_file):
-                        self.log_info("🔍 Détection ZIP par signature de fichier...")
-                        extract_dir = temp_path / "extracted"
-                        extract_dir.mkdir()
-                        
-                        try:
-                            with zipfile.ZipFile(working_file, 'r') as zip_file:
-                                zip_file.extractall(extract_dir)
-                            metadata.update(self._analyze_extracted_backup(extract_dir))
-                        except:
-                            pass
                 
         except Exception as e:
             self.log_error(f"❌ Erreur lors de l'analyse: {e}")
@@ -301,8 +480,13 @@ class ExternalRestoreService(BaseService):
         self.log_info(f"📊 Résultat analyse: valide={metadata['is_valid']}, type={metadata['backup_type']}, tables={metadata['estimated_tables']}")
         return metadata
     
-    def _analyze_extracted_backup(self, extract_dir: Path) -> Dict[str, Any]:
-        """Analyse un répertoire de sauvegarde extrait"""
+    def _analyze_zip_backup(self, zip_file: zipfile.ZipFile) -> Dict[str, Any]:
+        """
+        Analyse une archive de sauvegarde sans l'extraire
+        
+        Les fichiers sont reconnus par leur nom dans l'archive; seuls les dumps SQL
+        sont lus, en flux, directement depuis leur entrée ZIP.
+        """
         analysis = {
             'is_valid': False,
             'backup_type': 'unknown',
@@ -313,22 +497,40 @@ class ExternalRestoreService(BaseService):
             'analysis_warnings': []
         }
         
-        self.log_info(f"📂 Analyse du répertoire extrait: {extract_dir}")
+        self.log_info(f"📂 Analyse de l'archive: {zip_file.filename}")
         
-        # Lister tous les fichiers trouvés
-        all_files = list(extract_dir.rglob("*"))
+        # Lister toutes les entrées (nom de base pour reconnaître les types de fichiers)
+        all_files = zip_file.infolist()
         self.log_info(f"   📄 {len(all_files)} fichiers trouvés au total")
         
-        # Chercher les fichiers SQL
-        sql_files = list(extract_dir.rglob("*.sql"))
+        # Classer chaque entrée en un seul passage sur la liste de l'archive
+        sql_files, metadata_files, db_files, json_files, csv_files = [], [], [], [], []
+        for info in all_files:
+            if info.is_dir():
+                continue
+            name = PurePosixPath(info.filename).name
+            if name.endswith('.sql'):
+                sql_files.append(info)
+            if name.endswith('.db') or '.sqlite' in name:
+                db_files.append(info)
+            if name.endswith('.csv'):
+                csv_files.append(info)
+            if name.endswith('.json'):
+                json_files.append(info)
+                if name == 'metadata.json':
+                    metadata_files.append(info)
+        
+        # Fichiers SQL
         self.log_info(f"   📊 {len(sql_files)} fichiers SQL trouvés")
         
         if sql_files:
             analysis['backup_type'] = 'sql_dump'
             
-            for sql_file in sql_files:
-                self.log_info(f"   🔍 Analyse de {sql_file.name}")
-                sql_analysis = self._analyze_sql_file(sql_file)
+            for sql_info in sql_files:
+                self.log_info(f"   🔍 Analyse de {PurePosixPath(sql_info.filename).name}")
+                with zip_file.open(sql_info) as raw_file, \
+                        io.TextIOWrapper(raw_file, encoding='utf-8') as sql_stream:
+                    sql_analysis = self._analyze_sql_stream(sql_stream, sql_info.filename)
                 analysis['estimated_tables'] += sql_analysis['tables_count']
                 analysis['sql_statements'] += sql_analysis['statements_count']
                 
@@ -338,17 +540,12 @@ class ExternalRestoreService(BaseService):
                         "⚠️ Contient des tables système - fusion sécurisée recommandée"
                     )
         
-        # Chercher les métadonnées Django
-        metadata_files = list(extract_dir.rglob("metadata.json"))
+        # Métadonnées Django
         self.log_info(f"   📋 {len(metadata_files)} fichiers de métadonnées trouvés")
         if metadata_files:
             analysis['backup_type'] = 'full_django'
         
-        # Chercher d'autres types de fichiers reconnus
-        db_files = list(extract_dir.rglob("*.db")) + list(extract_dir.rglob("*.sqlite*"))
-        json_files = list(extract_dir.rglob("*.json"))
-        csv_files = list(extract_dir.rglob("*.csv"))
-        
+        # Autres types de fichiers reconnus
         self.log_info(f"   💾 {len(db_files)} fichiers de base de données")
         self.log_info(f"   📝 {len(json_files)} fichiers JSON")
         self.log_info(f"   📈 {len(csv_files)} fichiers CSV")
@@ -389,6 +586,15 @@ class ExternalRestoreService(BaseService):
     
     def _analyze_sql_file(self, sql_file: Path) -> Dict[str, Any]:
         """Analyse un fichier SQL pour détecter les tables système"""
+        try:
+            with open(sql_file, 'r', encoding='utf-8', buffering=self.SQL_READ_BUFFER_SIZE) as f:
+                return self._analyze_sql_stream(f, sql_file)
+        except OSError as e:
+            self.log_warning(f"⚠️ Erreur analyse SQL {sql_file}: {e}")
+            return {'tables_count': 0, 'statements_count': 0, 'has_system_tables': False, 'system_tables_found': []}
+    
+    def _analyze_sql_stream(self, lines: Iterable[str], source_name: Any) -> Dict[str, Any]:
+        """Analyse un dump SQL ligne à ligne (fichier ou entrée d'archive) pour détecter les tables système"""
         analysis = {
             'tables_count': 0,
             'statements_count': 0,
@@ -396,27 +602,36 @@ class ExternalRestoreService(BaseService):
             'system_tables_found': []
         }
         
+        statements_count = 0
+        tables_count = 0
+        system_tables_found = []
+        protected_tables = self.PROTECTED_SYSTEM_TABLES
         try:
-            with open(sql_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Compter les CREATE TABLE
-            import re
-            tables = re.findall(r'CREATE TABLE ["`]?(\w+)["`]?', content, re.IGNORECASE)
-            analysis['tables_count'] = len(tables)
-            
-            # Compter les INSERT statements
-            analysis['statements_count'] = len(re.findall(r'INSERT INTO', content, re.IGNORECASE))
+            # Lecture ligne à ligne: aucun chargement du dump complet en mémoire
+            for line in lines:
+                line_match = SQL_LINE_RE.match(line)
+                if line_match is None:
+                    continue
+                
+                table = line_match.group(1)
+                if table is None:
+                    # INSERT statement
+                    statements_count += 1
+                    continue
+                
+                # CREATE TABLE: tables système détectées au passage
+                tables_count += 1
+                if table in protected_tables:
+                    system_tables_found.append(table)
             
-            # Détecter les tables système
-            for table in tables:
-                if table in self.PROTECTED_SYSTEM_TABLES:
-                    analysis['has_system_tables'] = True
-                    analysis['system_tables_found'].append(table)
+            analysis['tables_count'] = tables_count
+            analysis['has_system_tables'] = bool(system_tables_found)
+            analysis['system_tables_found'] = system_tables_found
             
         except Exception as e:
-            self.log_warning(f"⚠️ Erreur analyse SQL {sql_file}: {e}")
+            self.log_warning(f"⚠️ Erreur analyse SQL {source_name}: {e}")
         
+        analysis['statements_count'] = statements_count
         return analysis
     
     def _execute_external_restoration(self, restoration: ExternalRestoration) -> None:
@@ -489,25 +704,22 @@ class ExternalRestoreService(BaseService):
         filtered_statements = []
         
         try:
+            # Lecture en flux: seule l'instruction en cours est gardée en mémoire
             with open(sql_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            statements = content.split(';')
-            
-            for statement in statements:
-                statement = statement.strip()
-                if not statement:
-                    continue
-                
-                # Vérifier si le statement touche une table protégée
-                is_protected = self._is_statement_protected(statement)
-                
-                if not is_protected:
-                    filtered_statements.append(statement + ';')
-                else:
-                    # Log plus détaillé du filtrage
-                    table_name = self._extract_table_name_from_statement(statement)
-                    self.log_info(f"🛡️ Statement filtré: table système détectée '{table_name}'")
+                for statement in iter_sql_statements(f):
+                    statement = statement.strip()
+                    if not statement:
+                        continue
+                    
+                    # Vérifier si le statement touche une table protégée
+                    is_protected = self._is_statement_protected(statement)
+                    
+                    if not is_protected:
+                        filtered_statements.append(statement + ';')
+                    else:
+                        # Log plus détaillé du filtrage
+                        table_name = self._extract_table_name_from_statement(statement)
+                        self.log_info(f"🛡️ Statement filtré: table système détectée '{table_name}'")
             
         except Exception as e:
             self.log_error(f"❌ Erreur filtrage SQL {sql_file}: {e}")
@@ -516,44 +728,48 @@ class ExternalRestoreService(BaseService):
     
     def _is_statement_protected(self, statement: str) -> bool:
         """Vérifie si un statement SQL touche une table protégée"""
-        statement_lower = statement.lower()
+        # Extraire le nom de table du statement (déjà en minuscules)
+        table_name = self._extract_table_name_from_statement(statement)
         
-        # Extraire le nom de table du statement
-        table_name = self._extract_table_name_from_statement(statement_lower)
-        
-        if table_name:
-            # Vérification exacte du nom de table
-            if table_name in self.PROTECTED_SYSTEM_TABLES:
-                return True
-            
-            # Vérification par préfixe pour les tables Django/Auth
-            protected_prefixes = ['auth_', 'authentication_', 'django_', 'backup_manager_']
-            for prefix in protected_prefixes:
-                if table_name.startswith(prefix):
-                    return True
-        
-        return False
+        return bool(table_name) and self._is_table_protected(table_name)
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _is_table_protected(table_name: str) -> bool:
+        """Vérifie si une table est protégée (nom exact ou préfixe Django/Auth), mémoïsé par nom"""
+        return (
+            table_name in ExternalRestoreService.PROTECTED_SYSTEM_TABLES
+            or PROTECTED_TABLE_PREFIX_RE.match(table_name) is not None
+        )
     
     def _extract_table_name_from_statement(self, statement: str) -> Optional[str]:
-        """Extrait le nom de table d'un statement SQL"""
-        import re
-        
-        statement_lower = statement.lower().strip()
-        
-        # Patterns pour différents types de statements
-        patterns = [
-            r'create\s+table\s+(?:if\s+not\s+exists\s+)?[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
-            r'insert\s+into\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
-            r'update\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
-            r'delete\s+from\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
-            r'drop\s+table\s+(?:if\s+exists\s+)?[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
-            r'alter\s+table\s+[`"\']*([a-zA-Z_][a-zA-Z0-9_]*)[`"\']*',
-        ]
+        """Extrait le nom de table (en minuscules) d'un statement SQL"""
+        # Tête coupée avant la première parenthèse: identique pour tous les
+        # INSERT d'une même table, donc servie par le cache
+        head = statement[:STATEMENT_HEAD_LENGTH].split('(', 1)[0].lower()
+        table_name = self._extract_table_name_from_head(head)
+        if table_name is None and len(statement) > len(head):
+            # Nom de table au-delà de la tête (commentaire en préambule, etc.)
+            table_name = self._extract_table_name_from_head.__wrapped__(statement)
+        return table_name
+    
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def _extract_table_name_from_head(head: str) -> Optional[str]:
+        """Applique les motifs de nom de table à une tête d'instruction, mémoïsé par tête"""
+        # Un seul motif à essayer d'après le verbe de l'instruction
+        words = head.split(None, 1)
+        verb_pattern = TABLE_NAME_PATTERN_BY_VERB.get(words[0]) if words else None
+        if verb_pattern is not None:
+            match = verb_pattern.search(head)
+            if match:
+                return match.group(1).lower()
         
-        for pattern in patterns:
-            match = re.search(pattern, statement_lower)
+        # Verbe inconnu ou sans nom de table direct (CREATE TRIGGER, commentaire en tête...)
+        for pattern in TABLE_NAME_PATTERNS:
+            match = pattern.search(head)
             if match:
-                return match.group(1)
+                return match.group(1).lower()
         
         return None
     
@@ -573,50 +789,31 @@ class ExternalRestoreService(BaseService):
         # 1. Séparer les statements par type et les ordonner correctement
         create_statements, insert_statements, other_statements = self._sort_statements_by_dependency(filtered_data['sql_statements'])
         
-        # Appliquer les statements SQL dans l'ordre correct
-        from django.db import connection
+        # DDL répété (plusieurs dumps SQL dans l'archive): chaque définition n'est exécutée qu'une fois
+        create_statements = self._deduplicate_statements(create_statements)
+        other_statements = self._deduplicate_statements(other_statements)
         
+        # Appliquer les statements SQL dans l'ordre correct
         try:
             with connection.cursor() as cursor:
                 # 2. Désactiver temporairement les contraintes FK pour éviter les erreurs d'ordre
                 self.log_info("🔧 Désactivation temporaire des contraintes FK")
                 cursor.execute("PRAGMA foreign_keys = OFF;")
                 
-                # 3. D'abord, créer toutes les tables
-                self.log_info(f"📋 Création de {len(create_statements)} tables...")
-                for statement in create_statements:
-                    stmt_results = self._execute_single_statement(cursor, statement, results)
-                    # Accumulation correcte des statistiques
-                    results['statements_applied'] += stmt_results.get('statements_applied', 0)
-                    results['statements_failed'] += stmt_results.get('statements_failed', 0)
-                    results['tables_created'] += stmt_results.get('tables_created', 0)
-                    results['records_inserted'] += stmt_results.get('records_inserted', 0)
-                    if stmt_results.get('errors'):
-                        results['errors'].extend(stmt_results['errors'])
-                
-                # 4. Ensuite, autres statements (index, contraintes, etc.)
-                self.log_info(f"🔧 Application de {len(other_statements)} statements divers...")
-                for statement in other_statements:
-                    stmt_results = self._execute_single_statement(cursor, statement, results)
-                    # Accumulation correcte des statistiques
-                    results['statements_applied'] += stmt_results.get('statements_applied', 0)
-                    results['statements_failed'] += stmt_results.get('statements_failed', 0)
-                    results['tables_created'] += stmt_results.get('tables_created', 0)
-                    results['records_inserted'] += stmt_results.get('records_inserted', 0)
-                    if stmt_results.get('errors'):
-                        results['errors'].extend(stmt_results['errors'])
-                
-                # 5. Enfin, insérer toutes les données (sans ordre FK strict car FK désactivées)
-                self.log_info(f"📥 Insertion de {len(insert_statements)} enregistrements...")
-                for statement in insert_statements:
-                    stmt_results = self._execute_single_statement(cursor, statement, results)
-                    # Accumulation correcte des statistiques
-                    results['statements_applied'] += stmt_results.get('statements_applied', 0)
-                    results['statements_failed'] += stmt_results.get('statements_failed', 0)
-                    results['tables_created'] += stmt_results.get('tables_created', 0)
-                    results['records_inserted'] += stmt_results.get('records_inserted', 0)
-                    if stmt_results.get('errors'):
-                        results['errors'].extend(stmt_results['errors'])
+                # Une seule transaction pour toutes les phases: un commit au lieu d'un par
+                # statement (le PRAGMA ci-dessus doit rester hors transaction)
+                with transaction.atomic():
+                    # 3. D'abord, créer toutes les tables
+                    self.log_info(f"📋 Création de {len(create_statements)} tables...")
+                    self._execute_statements(cursor, create_statements, results)
+                    
+                    # 4. Ensuite, autres statements (index, contraintes, etc.)
+                    self.log_info(f"🔧 Application de {len(other_statements)} statements divers...")
+                    self._execute_statements(cursor, other_statements, results)
+                    
+                    # 5. Enfin, insérer toutes les données (sans ordre FK strict car FK désactivées)
+                    self.log_info(f"📥 Insertion de {len(insert_statements)} enregistrements...")
+                    self._execute_statements(cursor, insert_statements, results)
                 
                 # 6. Réactiver les contraintes FK
                 self.log_info("✅ Réactivation des contraintes FK")
@@ -659,7 +856,8 @@ class ExternalRestoreService(BaseService):
             if not statement.strip():
                 continue
                 
-            statement_upper = statement.upper().strip()
+            # Seul le début du statement est mis en majuscules (pas de copie complète)
+            statement_upper = statement.lstrip()[:len('CREATE TABLE')].upper()
             
             if statement_upper.startswith('CREATE TABLE'):
                 create_statements.append(statement)
@@ -699,7 +897,7 @@ class ExternalRestoreService(BaseService):
         other_inserts = []
         
         for statement in insert_statements:
-            table_name = self._extract_table_name_from_statement(statement.lower())
+            table_name = self._extract_table_name_from_statement(statement)
             
             if table_name in base_tables:
                 base_inserts.append(statement)
@@ -711,6 +909,78 @@ class ExternalRestoreService(BaseService):
         # Retourner dans l'ordre : base → autres → dépendantes
         return base_inserts + other_inserts + dependent_inserts
 
+    def _deduplicate_statements(self, statements: List[str]) -> List[str]:
+        """
+        Retire les statements DDL déjà vus (empreinte du texte sans espaces de bord), ordre conservé
+        
+        Seul le DDL (CREATE/ALTER/DROP/COMMENT) est dédoublonné: un INSERT, UPDATE,
+        DELETE ou SET répété peut être voulu et est conservé tel quel.
+        """
+        seen_fingerprints = set()
+        unique_statements = []
+        for statement in statements:
+            if not DDL_STATEMENT_RE.match(statement):
+                unique_statements.append(statement)
+                continue
+            fingerprint = hashlib.blake2b(statement.strip().encode('utf-8'), digest_size=16).digest()
+            if fingerprint not in seen_fingerprints:
+                seen_fingerprints.add(fingerprint)
+                unique_statements.append(statement)
+        
+        skipped = len(statements) - len(unique_statements)
+        if skipped:
+            self.log_info(f"♻️ {skipped} statements en double ignorés")
+        return unique_statements
+    
+    def _execute_statements(self, cursor, statements: List[str], results: Dict[str, Any]) -> None:
+        """
+        Exécute des statements par lots de STATEMENT_BATCH_SIZE, un savepoint par lot
+        
+        Si un statement du lot échoue, le lot est annulé puis rejoué statement par
+        statement pour isoler l'erreur (erreurs bénignes ignorées comme avant).
+        """
+        for start in range(0, len(statements), self.STATEMENT_BATCH_SIZE):
+            batch = [statement for statement in statements[start:start + self.STATEMENT_BATCH_SIZE] if statement.strip()]
+            resolved_batch = [self._resolve_id_conflicts(statement) for statement in batch]
+            
+            try:
+                with transaction.atomic():
+                    for resolved_statement in resolved_batch:
+                        cursor.execute(resolved_statement)
+            except Exception:
+                for statement in batch:
+                    self._accumulate_statement_results(results, self._execute_single_statement(cursor, statement, results))
+                continue
+            
+            for resolved_statement in resolved_batch:
+                stmt_results = {'statements_applied': 1}
+                self._count_applied_statement(resolved_statement, stmt_results)
+                self._accumulate_statement_results(results, stmt_results)
+    
+    @staticmethod
+    def _accumulate_statement_results(results: Dict[str, Any], stmt_results: Dict[str, Any]) -> None:
+        """Ajoute les statistiques d'un statement aux résultats globaux"""
+        results['statements_applied'] += stmt_results.get('statements_applied', 0)
+        results['statements_failed'] += stmt_results.get('statements_failed', 0)
+        results['tables_created'] += stmt_results.get('tables_created', 0)
+        results['records_inserted'] += stmt_results.get('records_inserted', 0)
+        if stmt_results.get('errors'):
+            results['errors'].extend(stmt_results['errors'])
+    
+    def _count_applied_statement(self, resolved_statement: str, update_results: Dict[str, Any]) -> None:
+        """Compte les types d'opérations d'un statement exécuté avec succès"""
+        statement_match = APPLIED_STATEMENT_RE.match(resolved_statement)
+        if statement_match is None:
+            return
+        
+        if statement_match.group(1):
+            update_results['tables_created'] = 1
+            self.log_info(f"✅ Table créée: {self._extract_table_name_from_statement(resolved_statement)}")
+        else:
+            # Compter le nombre d'enregistrements insérés
+            values_count = len(VALUES_KEYWORD_RE.findall(resolved_statement))
+            update_results['records_inserted'] = max(1, values_count)
+    
     def _execute_single_statement(self, cursor, statement: str, current_results: dict) -> dict:
         """Exécute un statement unique et met à jour les résultats"""
         update_results = {
@@ -735,15 +1005,7 @@ class ExternalRestoreService(BaseService):
             update_results['statements_applied'] = 1
             
             # Compter les types d'opérations
-            statement_upper = resolved_statement.upper()
-            if 'CREATE TABLE' in statement_upper:
-                update_results['tables_created'] = 1
-                self.log_info(f"✅ Table créée: {self._extract_table_name_from_statement(resolved_statement)}")
-            elif 'INSERT INTO' in statement_upper:
-                # Compter le nombre d'enregistrements insérés
-                import re
-                values_count = resolved_statement.upper().count('VALUES')
-                update_results['records_inserted'] = max(1, values_count)
+            self._count_applied_statement(resolved_statement, update_results)
                 
         except Exception as e:
             error_message = str(e)
@@ -779,47 +1041,39 @@ class ExternalRestoreService(BaseService):
         - Contraintes UNIQUE → ignore si elles existent déjà
         - Index → ignore s'ils existent déjà
         """
-        import re
-        
         statement_clean = statement.strip()
-        statement_upper = statement_clean.upper()
-        
-        # 1. STATEMENTS CREATE INDEX - Ignorer les erreurs "already exists"
-        if statement_upper.startswith('CREATE') and 'INDEX' in statement_upper:
-            # Transformer en CREATE INDEX IF NOT EXISTS
-            if 'IF NOT EXISTS' not in statement_upper:
-                return statement_clean.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1)
-            return statement_clean
+        # Début du statement en majuscules; copie complète seulement pour les CREATE (peu nombreux)
+        statement_head = statement_clean[:len('CREATE TABLE')].upper()
         
-        # 2. STATEMENTS CREATE TABLE - Ignorer si existe déjà
-        if statement_upper.startswith('CREATE TABLE'):
-            if 'IF NOT EXISTS' not in statement_upper:
-                return statement_clean.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)
+        if statement_head.startswith('CREATE'):
+            statement_upper = statement_clean.upper()
+            
+            # 1. STATEMENTS CREATE INDEX - Ignorer les erreurs "already exists"
+            if 'INDEX' in statement_upper:
+                # Transformer en CREATE INDEX IF NOT EXISTS
+                if 'IF NOT EXISTS' not in statement_upper:
+                    return statement_clean.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1)
+                return statement_clean
+            
+            # 2. STATEMENTS CREATE TABLE - Ignorer si existe déjà
+            if statement_head.startswith('CREATE TABLE'):
+                if 'IF NOT EXISTS' not in statement_upper:
+                    return statement_clean.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)
+                return statement_clean
+            
             return statement_clean
         
         # 3. STATEMENTS INSERT INTO 
-        if not statement_upper.startswith('INSERT INTO'):
+        if not statement_head.startswith('INSERT INTO'):
             return statement_clean
         
         # Extraire le nom de la table
-        table_match = re.search(r'INSERT\s+INTO\s+([a-zA-Z_][a-zA-Z0-9_]*)', statement_clean, re.IGNORECASE)
-        if not table_match:
+        table_name = self._parse_insert_table_name(statement_clean)
+        if not table_name:
             return statement_clean
-            
-        table_name = table_match.group(1)
-        
-        # Tables de données métier qui peuvent être écrasées avec INSERT OR REPLACE
-        data_tables = [
-            'database_dynamictable',
-            'database_dynamicfield', 
-            'database_dynamicrecord',
-            'database_dynamicvalue',
-            'conditional_fields_conditionalfieldrule',
-            'conditional_fields_conditionalfieldoption'
-        ]
         
         # Pour les tables de données métier, utiliser INSERT OR REPLACE
-        if table_name in data_tables:
+        if table_name in self.REPLACEABLE_DATA_TABLES:
             return statement_clean.replace('INSERT INTO', 'INSERT OR REPLACE INTO', 1)
         
         # Pour les autres tables système, essayer INSERT OR IGNORE 
@@ -827,6 +1081,33 @@ class ExternalRestoreService(BaseService):
         else:
             return statement_clean.replace('INSERT INTO', 'INSERT OR IGNORE INTO', 1)
     
+    @staticmethod
+    def _parse_insert_table_name(statement: str) -> Optional[str]:
+        """
+        Lit le nom de table d'un statement commençant par 'INSERT INTO', sans regex
+        
+        Parcours linéaire depuis le début du statement uniquement (jamais de recherche
+        dans les valeurs); accepte les noms nus ou entre "", `` ou [] (dumps SQLite/MySQL),
+        éventuellement qualifiés par un schéma (schéma.table: seule la table est retournée).
+        """
+        pos = len('INSERT INTO')
+        length = len(statement)
+        while pos < length and statement[pos].isspace():
+            pos += 1
+        if pos == len('INSERT INTO'):
+            return None
+        
+        name, pos = _read_sql_identifier(statement, pos)
+        if name is not None and statement.startswith('.', pos):
+            name, pos = _read_sql_identifier(statement, pos + 1)
+        if name is None:
+            return None
+        
+        # L'identifiant doit être suivi d'un séparateur (liste de colonnes, VALUES...)
+        if pos < length and not (statement[pos].isspace() or statement[pos] == '('):
+            return None
+        return name
+    
     def _finalize_external_restoration(self, restoration: ExternalRestoration, results: Dict[str, Any]) -> None:
         """Finalise la restauration externe avec les statistiques"""
         # Mettre à jour les statistiques de la restauration
@@ -858,14 +1139,21 @@ class ExternalRestoreService(BaseService):
         self.log_info(f"📝 Restauration {restoration.id} finalisée: {restoration.external_tables_processed} tables, {restoration.external_records_processed} enregistrements")
     
     def _calculate_file_checksum(self, file_path: Path) -> str:
-        """Calcule le checksum SHA-256 d'un fichier"""
-        import hashlib
-        
-        hash_sha256 = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_sha256.update(chunk)
-        return hash_sha256.hexdigest()
+        """Calcule le checksum SHA-256 d'un fichier (réutilisé tant que le fichier n'a pas changé)"""
+        file_stat = file_path.stat()
+        cached = self._checksum_cache.get(str(file_path))
+        if cached and cached[:2] == (file_stat.st_mtime_ns, file_stat.st_size):
+            return cached[2]
+        
+        checksum = self.calculate_checksum(file_path)
+        self._checksum_cache[str(file_path)] = (file_stat.st_mtime_ns, file_stat.st_size, checksum)
+        return checksum
+    
+    def _remember_checksum(self, file_path: Path, checksum: str) -> os.stat_result:
+        """Mémorise le checksum d'un fichier qui vient d'être écrit et retourne son stat"""
+        file_stat = file_path.stat()
+        self._checksum_cache[str(file_path)] = (file_stat.st_mtime_ns, file_stat.st_size, checksum)
+        return file_stat
     
     def _try_decrypt_backup(self, encrypted_path: Path, output_path: Path) -> bool:
         """Tente de déchiffrer un fichier de sauvegarde"""
@@ -889,8 +1177,7 @@ class ExternalRestoreService(BaseService):
                     backup_path = decrypted_path
             
             # Extraction ZIP
-            with zipfile.ZipFile(backup_path, 'r') as zip_file:
-                zip_file.extractall(temp_dir)
+            self._extract_zip(backup_path, temp_dir)
             
             return temp_dir
             
@@ -898,6 +1185,45 @@ class ExternalRestoreService(BaseService):
             shutil.rmtree(temp_dir, ignore_errors=True)
             raise Exception(f"Erreur extraction: {e}")
     
+    def _extract_zip(self, archive_path: Path, dest_dir: Path) -> None:
+        """
+        Extrait une archive ZIP, entrées décompressées en parallèle si elle est volumineuse
+        
+        Chaque thread lit l'archive avec son propre ZipFile (un ZipFile ne peut pas être
+        partagé entre threads); ZipFile.extract assainit les chemins comme extractall.
+        """
+        with zipfile.ZipFile(archive_path, 'r') as zip_file:
+            entries = zip_file.infolist()
+            total_size = sum(info.file_size for info in entries)
+            if self.EXTRACT_WORKERS <= 1 or len(entries) < 2 or total_size < self.PARALLEL_EXTRACT_MIN_SIZE:
+                zip_file.extractall(dest_dir)
+                return
+        
+        self.log_info(f"📦 Extraction parallèle: {len(entries)} entrées ({self.format_size(total_size)})")
+        thread_state = threading.local()
+        thread_archives = []
+        
+        def extract_entry(info: zipfile.ZipInfo) -> None:
+            archive = getattr(thread_state, 'archive', None)
+            if archive is None:
+                archive = thread_state.archive = zipfile.ZipFile(archive_path, 'r')
+                thread_archives.append(archive)
+            try:
+                archive.extract(info, dest_dir)
+            except FileExistsError:
+                # Répertoire parent créé au même instant par un autre thread: il existe désormais
+                archive.extract(info, dest_dir)
+        
+        try:
+            # Plus gros fichiers d'abord pour équilibrer la charge entre threads
+            entries.sort(key=lambda info: info.file_size, reverse=True)
+            with ThreadPoolExecutor(max_workers=self.EXTRACT_WORKERS, thread_name_prefix='zip-extract') as executor:
+                for _ in executor.map(extract_entry, entries):
+                    pass
+        finally:
+            for archive in thread_archives:
+                archive.close()
+    
     def list_external_uploads(self, user) -> List[UploadedBackup]:
         """Liste les uploads externes d'un utilisateur"""
         return UploadedBackup.objects.filter(uploaded_by=user).order_by('-uploaded_at')
@@ -938,8 +1264,6 @@ class ExternalRestoreService(BaseService):
         try:
             with open(file_path, 'rb') as f:
                 # Lire les 4 premiers bytes pour vérifier la signature ZIP
-                signature = f.read(4)
-                # Signatures ZIP possibles: PK\x03\x04, PK\x05\x06, PK\x07\x08
-                return signature.startswith(b'PK')
+                return f.read(4) in ZIP_SIGNATURES
         except:
             return False 
\ No newline at end of file
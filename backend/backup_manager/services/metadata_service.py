@@ -447,14 +447,12 @@ class MetadataService(BaseService):
             # Traiter les modèles dans l'ordre défini
             for model_name in self.IMPORT_ORDER:
                 if model_name in data_by_model:
-                    for record in data_by_model[model_name]:
+                    for record in data_by_model.pop(model_name):
                         processed_record, mods = self._process_record(
                             record, model_name, username_to_id_map, fallback_user_id
                         )
                         processed_data.append(processed_record)
                         modifications_count += mods
-                    
-                    del data_by_model[model_name]
             
             # Ajouter les modèles non ordonnés
             for remaining_model, records in data_by_model.items():
@@ -466,15 +464,19 @@ class MetadataService(BaseService):
                     processed_data.append(processed_record)
                     modifications_count += mods
             
-            # Si aucune modification, retourner le fichier original
+            # Si aucune modification, retourner le fichier original (rien n'est écrit)
             if modifications_count == 0:
                 self.log_info("✅ Aucune correction de schéma nécessaire")
                 return import_path
             
-            # Créer un fichier temporaire avec les corrections
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as temp_file:
-                json.dump(processed_data, temp_file, indent=2, ensure_ascii=False)
+            # Écriture enregistrement par enregistrement, sans construire le JSON complet en mémoire
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as temp_file:
                 temp_path = Path(temp_file.name)
+            try:
+                self.save_json_stream(processed_data, temp_path)
+            except Exception:
+                temp_path.unlink(missing_ok=True)
+                raise
             
             self.log_info(f"🔧 Schéma corrigé: {modifications_count} modifications, fichier: {temp_path}")
             return temp_path
@@ -410,7 +410,11 @@ class RestoreService(BaseService):
     def _cleanup_after_restore(self, work_dir: Path) -> None:
         """Effectue le nettoyage après la restauration"""
         self._cleanup_restore_directory(work_dir)
-        self._auto_cleanup_temp_files()
+        
+        # Nettoyage automatique en arrière-plan, regroupé avec les demandes récentes
+        from .cleanup_service import CleanupService
+        if not CleanupService.schedule_auto_cleanup(self._auto_cleanup_temp_files):
+            self.log_info("🧹 Nettoyage automatique ignoré (exécuté récemment)")
     
     def _create_restore_directory(self, restore_name: str) -> Path:
         """Crée le répertoire de travail pour la restauration"""
@@ -660,11 +664,13 @@ class RestoreService(BaseService):
         
         if "UNIQUE constraint failed" in error_msg:
             if restore_options.get('ignore_duplicates', True):
-                self.log_debug(f"⚠️ Doublon ignoré: {error_msg}")
+                if self._debug_enabled:
+                    self.log_debug(f"⚠️ Doublon ignoré: {error_msg}")
                 return False
         elif "FOREIGN KEY constraint failed" in error_msg:
             deferred_statements.append((statement, line_num))
-            self.log_debug(f"🔄 Statement différé pour FK: ligne {line_num}")
+            if self._debug_enabled:
+                self.log_debug(f"🔄 Statement différé pour FK: ligne {line_num}")
             return False
         elif "NOT NULL constraint failed" in error_msg:
             corrected_statement = self._fix_not_null_statement(statement, error_msg)
@@ -702,7 +708,8 @@ class RestoreService(BaseService):
                 try:
                     cursor.execute(statement)
                     executed_count += 1
-                    self.log_debug(f"✅ Statement retry réussi: ligne {line_num}")
+                    if self._debug_enabled:
+                        self.log_debug(f"✅ Statement retry réussi: ligne {line_num}")
                 except sqlite3.Error as e:
                     remaining_statements.append((statement, line_num))
                     if retry_count == self.MAX_SQL_RETRIES:
@@ -836,7 +843,8 @@ class RestoreService(BaseService):
             
             if should_exclude:
                 excluded_count += 1
-                self.log_debug(f"🚫 Statement exclu (table système): {statement[:50]}...")
+                if self._debug_enabled:
+                    self.log_debug(f"🚫 Statement exclu (table système): {statement[:50]}...")
             else:
                 filtered_statements.append(statement)
         
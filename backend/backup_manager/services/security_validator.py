@@ -15,6 +15,7 @@ from typing import Dict, List, Optional, Tuple, Any
 from contextlib import contextmanager
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
+from .encryption_service import EncryptionService
 
 # Configuration du logger de sécurité
 security_logger = logging.getLogger('django.security')
@@ -279,6 +280,10 @@ class SecurityValidator:
             result['checks_passed'].append('zip_signature_check')
         elif file_header.startswith(b'Salted__'):  # Fichier chiffré OpenSSL
             result['checks_passed'].append('encrypted_signature_check')
+        elif file_header.startswith((
+            EncryptionService.GCM_MAGIC, *EncryptionService.GCM_PASSWORD_FORMATS
+        )):  # Sauvegarde chiffrée AES-GCM
+            result['checks_passed'].append('encrypted_signature_check')
         else:
             result['security_warnings'].append("Signature de fichier non reconnue")
     
@@ -0,0 +1,211 @@
+import io
+import os
+import sqlite3
+import tempfile
+import zipfile
+from pathlib import Path
+
+from cryptography.exceptions import InvalidTag
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+
+from .services.encryption_service import EncryptionService
+from .services.external_restore_service import ExternalRestoreService, iter_sql_statements
+
+
+class IterSqlStatementsTests(SimpleTestCase):
+    """Découpage d'un dump SQL en instructions"""
+
+    def split(self, sql):
+        return [statement.strip() for statement in iter_sql_statements(sql.splitlines(keepends=True))]
+
+    def test_splits_on_semicolons(self):
+        self.assertEqual(
+            self.split("CREATE TABLE t (a INTEGER);\nINSERT INTO t VALUES(1);\n"),
+            ['CREATE TABLE t (a INTEGER)', 'INSERT INTO t VALUES(1)'],
+        )
+
+    def test_ignores_semicolons_in_quotes(self):
+        self.assertEqual(
+            self.split("""INSERT INTO t VALUES('a;b', "c;d");INSERT INTO t VALUES('it''s;');"""),
+            ["""INSERT INTO t VALUES('a;b', "c;d")""", "INSERT INTO t VALUES('it''s;')"],
+        )
+
+    def test_ignores_semicolons_in_comments(self):
+        self.assertEqual(
+            self.split("-- commentaire; ignoré\nINSERT INTO t VALUES(1) /* ; */;\n"),
+            ['-- commentaire; ignoré\nINSERT INTO t VALUES(1) /* ; */'],
+        )
+
+    def test_multiline_comment(self):
+        self.assertEqual(
+            self.split("/* début;\nfin; */ INSERT INTO t VALUES(1);"),
+            ['/* début;\nfin; */ INSERT INTO t VALUES(1)'],
+        )
+
+    def test_multiline_literal(self):
+        self.assertEqual(
+            self.split("INSERT INTO t VALUES('ligne 1;\nligne 2;');\nINSERT INTO t VALUES(2);"),
+            ["INSERT INTO t VALUES('ligne 1;\nligne 2;')", 'INSERT INTO t VALUES(2)'],
+        )
+
+    def test_yields_trailing_statement_without_semicolon(self):
+        self.assertEqual(self.split("INSERT INTO t VALUES(1);\nINSERT INTO t VALUES(2)\n"),
+                         ['INSERT INTO t VALUES(1)', 'INSERT INTO t VALUES(2)'])
+        self.assertEqual(self.split("INSERT INTO t VALUES(1);\n  \n"), ['INSERT INTO t VALUES(1)'])
+
+
+class ParseInsertTableNameTests(SimpleTestCase):
+    """Lecture du nom de table d'un INSERT INTO"""
+
+    def parse(self, statement):
+        return ExternalRestoreService._parse_insert_table_name(statement)
+
+    def test_bare_name(self):
+        self.assertEqual(self.parse('INSERT INTO database_dynamictable VALUES(1)'), 'database_dynamictable')
+        self.assertEqual(self.parse('INSERT INTO t(a, b) VALUES(1, 2)'), 't')
+
+    def test_quoted_names(self):
+        self.assertEqual(self.parse('INSERT INTO "t" VALUES(1)'), 't')
+        self.assertEqual(self.parse('INSERT INTO `t` VALUES(1)'), 't')
+        self.assertEqual(self.parse('INSERT INTO [ma table] VALUES(1)'), 'ma table')
+
+    def test_doubled_quotes(self):
+        self.assertEqual(self.parse('INSERT INTO "a""b" VALUES(1)'), 'a"b')
+
+    def test_schema_qualifier(self):
+        self.assertEqual(self.parse('INSERT INTO "main"."database_dynamictable" VALUES(1)'),
+                         'database_dynamictable')
+        self.assertEqual(self.parse('INSERT INTO main.t VALUES(1)'), 't')
+
+    def test_invalid_targets(self):
+        for statement in (
+            'INSERT INTO',
+            'INSERT INTO ',
+            'INSERT INTO "" VALUES(1)',
+            'INSERT INTO "t VALUES(1)',
+            'INSERT INTO 1t VALUES(1)',
+            'INSERT INTO "a"b VALUES(1)',
+            'INSERT INTO "main". VALUES(1)',
+        ):
+            with self.subTest(statement=statement):
+                self.assertIsNone(self.parse(statement))
+
+
+class DeduplicateStatementsTests(SimpleTestCase):
+    """Dédoublonnage des statements SQL avant application"""
+
+    def setUp(self):
+        self.service = ExternalRestoreService()
+
+    def test_repeated_ddl_is_applied_once(self):
+        statements = ['CREATE TABLE t (a INTEGER)', '  CREATE TABLE t (a INTEGER)\n', 'DROP TABLE u', 'DROP TABLE u']
+        self.assertEqual(self.service._deduplicate_statements(statements),
+                         ['CREATE TABLE t (a INTEGER)', 'DROP TABLE u'])
+
+    def test_whitespace_inside_literals_is_significant(self):
+        statements = ["CREATE VIEW v AS SELECT 'a  b'", "CREATE VIEW v AS SELECT 'a b'"]
+        self.assertEqual(self.service._deduplicate_statements(statements), statements)
+
+    def test_repeated_update_runs_twice(self):
+        statements = ['UPDATE t SET a = a + 1', 'UPDATE t SET a = a + 1']
+        kept = self.service._deduplicate_statements(statements)
+        self.assertEqual(kept, statements)
+
+        db = sqlite3.connect(':memory:')
+        self.addCleanup(db.close)
+        db.execute('CREATE TABLE t (a INTEGER)')
+        db.execute('INSERT INTO t VALUES (0)')
+        for statement in kept:
+            db.execute(statement)
+        self.assertEqual(db.execute('SELECT a FROM t').fetchone(), (2,))
+
+
+class EncryptionRoundTripTests(SimpleTestCase):
+    """Chiffrement AES-GCM par blocs avec une clé brute"""
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = Path(temp_dir.name)
+        self.service = EncryptionService()
+        self.key = os.urandom(32)
+        self.source_path = self.temp_dir / 'source.bin'
+        self.encrypted_path = self.temp_dir / 'source.bin.enc'
+        self.decrypted_path = self.temp_dir / 'source.bin.dec'
+
+    def encrypt(self, data):
+        self.source_path.write_bytes(data)
+        self.service.encrypt_file_with_key(self.source_path, self.encrypted_path, self.key)
+        return self.encrypted_path.read_bytes()
+
+    def decrypt(self):
+        self.service.decrypt_file_with_key(self.encrypted_path, self.decrypted_path, self.key)
+        return self.decrypted_path.read_bytes()
+
+    def test_round_trip(self):
+        for size in (0, 5, EncryptionService.GCM_CHUNK_SIZE, 2 * EncryptionService.GCM_CHUNK_SIZE + 7):
+            with self.subTest(size=size):
+                data = os.urandom(size)
+                encrypted = self.encrypt(data)
+                self.assertTrue(encrypted.startswith(EncryptionService.GCM_MAGIC))
+                self.assertEqual(self.decrypt(), data)
+
+    def test_truncation_is_detected(self):
+        chunk_size = EncryptionService.GCM_CHUNK_SIZE
+        encrypted = self.encrypt(os.urandom(2 * chunk_size + 7))
+        header_size = len(EncryptionService.GCM_MAGIC) + EncryptionService.GCM_NONCE_PREFIX_SIZE
+        first_frame_end = header_size + chunk_size + EncryptionService.GCM_TAG_SIZE
+
+        for truncated in (encrypted[:-1], encrypted[:first_frame_end], encrypted[:header_size]):
+            with self.subTest(length=len(truncated)):
+                self.encrypted_path.write_bytes(truncated)
+                with self.assertRaises((ValueError, InvalidTag)):
+                    self.decrypt()
+
+    def test_wrong_key_is_rejected(self):
+        self.encrypt(b'contenu de sauvegarde')
+        self.key = os.urandom(32)
+        with self.assertRaises((ValueError, InvalidTag)):
+            self.decrypt()
+
+
+class ExternalUploadSessionTests(TestCase):
+    """Upload externe par un utilisateur authentifié par session (vérification CSRF active)"""
+
+    url = '/api/backup/external-uploads/'
+    csrf_token = 'a' * 32
+
+    def setUp(self):
+        backup_root = tempfile.TemporaryDirectory()
+        self.addCleanup(backup_root.cleanup)
+        settings_override = override_settings(
+            BACKUP_ROOT=backup_root.name, ALLOWED_HOSTS=['testserver'], EXTERNAL_UPLOAD_MAX_BYTES=100_000
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        user = get_user_model().objects.create_user(username='upload', password='secret', email='upload@example.fr')
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(user)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = self.csrf_token
+
+    def post_upload(self, content):
+        return self.client.post(self.url, {
+            'file': SimpleUploadedFile('sauvegarde.zip', content),
+            'upload_name': 'sauvegarde',
+        }, HTTP_X_CSRFTOKEN=self.csrf_token)
+
+    def test_upload_within_limit_is_accepted(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            zip_file.writestr('database.sql', 'CREATE TABLE t (a INTEGER);\n')
+
+        response = self.post_upload(archive.getvalue())
+        self.assertEqual(response.status_code, 201)
+
+    def test_upload_over_limit_is_rejected(self):
+        response = self.post_upload(b'x' * 200_000)
+        self.assertEqual(response.status_code, 413)
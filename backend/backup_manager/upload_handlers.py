@@ -0,0 +1,51 @@
+"""
+Gestionnaires d'upload pour les sauvegardes externes
+Limite de taille appliquée pendant la réception du corps de requête, avant tout stockage
+"""
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+# Marge pour l'enveloppe multipart (en-têtes de parties, autres champs du formulaire)
+MULTIPART_OVERHEAD_MARGIN = 64 * 1024
+
+
+class ExternalUploadSizeLimitHandler(FileUploadHandler):
+    """
+    Interrompt la réception d'un upload externe dès qu'il dépasse EXTERNAL_UPLOAD_MAX_BYTES
+
+    Placé en tête de request.upload_handlers: le Content-Length annoncé est vérifié
+    avant la lecture du corps, puis les octets réellement reçus au fil des chunks.
+    Les gestionnaires suivants (mémoire, fichier temporaire) ne reçoivent ainsi jamais
+    plus que la limite. La vue consulte upload_too_large pour répondre 413.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = getattr(settings, 'EXTERNAL_UPLOAD_MAX_BYTES', 500 * 1024 * 1024)
+        self.upload_too_large = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        """Refuse d'emblée un corps annoncé plus gros que la limite (plus l'enveloppe multipart)"""
+        if content_length and content_length > self.max_bytes + MULTIPART_OVERHEAD_MARGIN:
+            self.upload_too_large = True
+        return None
+
+    def new_file(self, *args, **kwargs):
+        """Arrête la lecture avant le premier octet de fichier si le corps est trop gros"""
+        super().new_file(*args, **kwargs)
+        if self.upload_too_large or (self.content_length and self.content_length > self.max_bytes):
+            self.upload_too_large = True
+            raise StopUpload(connection_reset=True)
+
+    def receive_data_chunk(self, raw_data, start):
+        """Compte les octets réellement reçus (Content-Length absent ou inexact)"""
+        if start + len(raw_data) > self.max_bytes:
+            self.upload_too_large = True
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        """Laisse les gestionnaires suivants construire le fichier uploadé"""
+        return None
@@ -43,6 +43,7 @@ from .serializers import (
 from .services import BackupService, RestoreService, StorageService
 from .services.encryption_service import EncryptionService
 from .services.security_validator import SecurityValidator, SecurityValidationError
+from .upload_handlers import ExternalUploadSizeLimitHandler
 
 # Configuration des loggers
 logger = logging.getLogger(__name__)
@@ -916,10 +917,13 @@ class RestoreOperationsViewSet(BaseBackupViewMixin, viewsets.ViewSet):
             safe_filename = f"uploaded_backup_{security_result['file_hash'][:16]}.{uploaded_file.name.split('.')[-1]}"
             temp_file_path = upload_dir / safe_filename
             
-            # Sauvegarder le fichier uploadé
-            with open(temp_file_path, 'wb') as temp_file:
-                uploaded_file.seek(0)
-                shutil.copyfileobj(uploaded_file, temp_file)
+            # Sauvegarder le fichier uploadé (gros uploads déjà sur disque: copie noyau)
+            if hasattr(uploaded_file, 'temporary_file_path'):
+                EncryptionService().copy_file(Path(uploaded_file.temporary_file_path()), temp_file_path)
+            else:
+                with open(temp_file_path, 'wb') as temp_file:
+                    uploaded_file.seek(0)
+                    shutil.copyfileobj(uploaded_file, temp_file)
             
             security_logger.info(f"Fichier sauvegardé temporairement: {temp_file_path}")
             
@@ -1572,6 +1576,24 @@ class ExternalUploadViewSet(BaseBackupViewMixin, viewsets.ModelViewSet):
             return ExternalUploadRequestSerializer
         return UploadedBackupSerializer
     
+    def initialize_request(self, request, *args, **kwargs):
+        """
+        Installe la limite de taille avant l'authentification
+        
+        La vérification CSRF de SessionAuthentication lit request.POST: le corps
+        multipart est analysé avant create(), la limite doit donc déjà être en place.
+        """
+        self.size_limit_handler = None
+        if request.method == 'POST':
+            size_limit_handler = ExternalUploadSizeLimitHandler(request)
+            try:
+                request.upload_handlers.insert(0, size_limit_handler)
+                self.size_limit_handler = size_limit_handler
+            except AttributeError:
+                # Corps déjà analysé (middleware): limite vérifiée par handle_external_upload
+                logger.warning("Limite de taille d'upload externe non installée: corps déjà analysé")
+        return super().initialize_request(request, *args, **kwargs)
+    
     def create(self, request):
         """
         Upload d'une sauvegarde externe avec validation et traitement sécurisé.
@@ -1579,8 +1601,19 @@ class ExternalUploadViewSet(BaseBackupViewMixin, viewsets.ModelViewSet):
         SÉCURITÉ: Les uploads sont isolés dans un répertoire séparé et
         n'interfèrent jamais avec l'historique du système principal.
         """
+        # Limite de taille appliquée pendant la réception du corps (voir initialize_request)
+        size_limit_handler = self.size_limit_handler
+        
         try:
-            serializer = self.get_serializer(data=request.data)
+            request_data = request.data
+            if size_limit_handler is not None and size_limit_handler.upload_too_large:
+                logger.warning(f"Upload externe refusé: plus de {size_limit_handler.max_bytes} bytes")
+                return Response(self.create_error_response(
+                    message="Fichier trop volumineux",
+                    error=f"Taille maximale: {size_limit_handler.max_bytes // (1024 * 1024)} MB"
+                ), status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            
+            serializer = self.get_serializer(data=request_data)
             serializer.is_valid(raise_exception=True)
             
             uploaded_file = serializer.validated_data['file']
@@ -1605,7 +1638,7 @@ class ExternalUploadViewSet(BaseBackupViewMixin, viewsets.ModelViewSet):
             ), status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            self.log_error(f"Erreur upload externe: {e}")
+            logger.error(f"Erreur upload externe: {e}")
             return Response(self.create_error_response(
                 message="Erreur lors de l'upload externe",
                 error=str(e)